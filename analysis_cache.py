@@ -0,0 +1,119 @@
+import json
+
+from db import get_db, retry_on_busy
+from utils import now_iso
+from rulesets import RULESETS
+from matcher import ruleset_fingerprint
+from analysis_engine import ENGINE_ID
+
+try:
+    from config import ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_MAX_BYTES
+except Exception:
+    ANALYSIS_CACHE_MAX_ENTRIES = 5000
+    ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# -----------------------------
+# Content-addressed analysis cache
+# -----------------------------
+#
+# Entries are keyed by (file sha256, ruleset name, ruleset fingerprint,
+# engine id). Editing a ruleset in rulesets.py changes its fingerprint,
+# and bumping ENGINE_VERSION (or switching regex engines) changes the engine
+# id, so stale entries simply stop matching and are removed by prune().
+#
+# Incomplete results (a pattern cut off by the regex time budget, a scan
+# stopped early, or text missing because extraction hit a problem such as
+# failed OCR) are never cached: a bad run must not become the permanent
+# answer for that file.
+
+
+def get_cached_analysis(file_sha256, ruleset_name):
+    fp = ruleset_fingerprint(RULESETS[ruleset_name])
+    con = get_db()
+    row = con.execute("""
+        SELECT analysis_json FROM analysis_cache
+        WHERE file_sha256=? AND ruleset=? AND ruleset_fingerprint=? AND engine_version=?
+    """, (file_sha256, ruleset_name, fp, ENGINE_ID)).fetchone()
+
+    if row is None:
+        con.close()
+        return None
+
+    con.execute("""
+        UPDATE analysis_cache SET last_used_at=?
+        WHERE file_sha256=? AND ruleset=? AND ruleset_fingerprint=? AND engine_version=?
+    """, (now_iso(), file_sha256, ruleset_name, fp, ENGINE_ID))
+    con.commit()
+    con.close()
+    return json.loads(row["analysis_json"])
+
+
+def _cacheable(analysis):
+    return not (analysis.get("truncated_patterns") or analysis.get("partial_scan")
+                or analysis.get("extraction_warnings"))
+
+
+@retry_on_busy
+def put_cached_analysis(file_sha256, ruleset_name, analysis):
+    """Cache a complete analysis; incomplete ones are ignored (see above)."""
+    if not _cacheable(analysis):
+        return
+    fp = ruleset_fingerprint(RULESETS[ruleset_name])
+    payload = json.dumps(analysis)
+    ts = now_iso()
+
+    con = get_db()
+    con.execute("""
+        INSERT OR REPLACE INTO analysis_cache
+        (file_sha256, ruleset, ruleset_fingerprint, engine_version,
+         analysis_json, size_bytes, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (file_sha256, ruleset_name, fp, ENGINE_ID, payload, len(payload), ts, ts))
+    con.commit()
+    _prune(con)
+    con.close()
+
+
+def cached_analysis(file_sha256, ruleset_name, analyze):
+    """Return the cached analysis, or call analyze() and cache its result."""
+    analysis = get_cached_analysis(file_sha256, ruleset_name)
+    if analysis is None:
+        analysis = analyze()
+        put_cached_analysis(file_sha256, ruleset_name, analysis)
+    return analysis
+
+
+def prune(max_entries=ANALYSIS_CACHE_MAX_ENTRIES, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+    con = get_db()
+    _prune(con, max_entries, max_bytes)
+    con.close()
+
+
+def _prune(con, max_entries=ANALYSIS_CACHE_MAX_ENTRIES, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+    # 1) entries from other engine versions or edited/removed rulesets
+    current = [(name, ruleset_fingerprint(rs)) for name, rs in RULESETS.items()]
+    keep = " OR ".join(["(ruleset=? AND ruleset_fingerprint=?)"] * len(current)) or "0"
+    con.execute(f"""
+        DELETE FROM analysis_cache
+        WHERE engine_version != ? OR NOT ({keep})
+    """, [ENGINE_ID] + [v for pair in current for v in pair])
+
+    # 2) least recently used entries beyond the entry / size budget
+    count, total = con.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM analysis_cache"
+    ).fetchone()
+    if count > max_entries or total > max_bytes:
+        rows = con.execute("""
+            SELECT rowid, size_bytes FROM analysis_cache
+            ORDER BY last_used_at ASC, rowid ASC
+        """).fetchall()
+        evict = []
+        for r in rows:
+            if count <= max_entries and total <= max_bytes:
+                break
+            evict.append((r["rowid"],))
+            count -= 1
+            total -= r["size_bytes"]
+        con.executemany("DELETE FROM analysis_cache WHERE rowid=?", evict)
+
+    con.commit()
@@ -1,9 +1,36 @@
-import re
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Tuple
 
 from utils import clamp
 from rulesets import RULESETS
+from matcher import HARD_REGEX_TIMEOUTS, CompiledRuleset, get_compiled
+from metrics import REGISTRY
+
+try:
+    from config import REGEX_PATTERN_BUDGET_MS, REGEX_DOCUMENT_BUDGET_MS
+except Exception:
+    REGEX_PATTERN_BUDGET_MS = 2000
+    REGEX_DOCUMENT_BUDGET_MS = 10000
+
+# Bump whenever a change to this module (or to text extraction) alters
+# analysis output; cached analyses from other engine versions are ignored
+# (see analysis_cache).
+ENGINE_VERSION = "2.5"
+
+# ENGINE_VERSION plus the regex engine in use: the third-party `regex`
+# module (picked up when installed) does not match exactly like `re`, so
+# stored results are only reused under the same engine.
+ENGINE_ID = f"{ENGINE_VERSION}/{'regex' if HARD_REGEX_TIMEOUTS else 're'}"
+
+# Characters kept between streaming windows. Must cover the longest phrase
+# or regex match plus the excerpt padding on either side.
+STREAM_OVERLAP_CHARS = 512
+
+# Risk score at which a document is rated HIGH; also the default triage stop.
+HIGH_RISK_SCORE = 70
 
 # -----------------------------
 # Option 2: Upgraded analysis
@@ -26,47 +53,327 @@ def _snip(text: str, start: int, end: int, pad: int = 60) -> str:
     return snippet[:240] + ("…" if len(snippet) > 240 else "")
 
 
-def _regex_hits(text: str, name: str, pattern: str, flags=re.IGNORECASE) -> Tuple[int, List[str]]:
-    hits = []
-    for m in re.finditer(pattern, text, flags):
-        hits.append(_snip(text, m.start(), m.end()))
-    return len(hits), hits[:8]  # cap stored excerpts
-
-
-def _contains_any(tlow: str, phrases: List[str]) -> List[str]:
-    return [p for p in phrases if p in tlow]
+class _ScanState:
+    """Hit table accumulated over one or more windows of a document.
 
+    Only first-occurrence excerpts, per-regex match counts and the first few
+    excerpts per regex are kept, so memory does not grow with document size.
+    """
 
-def analyze_text(text: str, ruleset_name: str) -> Dict[str, Any]:
+    def __init__(self, compiled: CompiledRuleset, excerpt_cap: int = 8, score_only: bool = False,
+                 profile: bool = False):
+        self.compiled = compiled
+        self.excerpt_cap = 0 if score_only else excerpt_cap
+        self.score_only = score_only
+        self.phrase_excerpts: Dict[str, str] = {}         # phrase -> excerpt at first occurrence
+        self.pattern_counts: Dict[str, int] = {}          # regex -> match count
+        self.pattern_excerpts: Dict[str, List[str]] = {}  # regex -> first excerpts
+        self._resume: Dict[str, int] = {}                 # regex -> absolute end of last match
+
+        # "phrases" / regex -> [seconds, matches, chars scanned]; None when not profiling
+        self.timings: Dict[str, List[float]] | None = {} if profile else None
+        self.started = time.perf_counter()
+
+        # regex execution budget for this document
+        self.regex_spent: Dict[str, float] = {}   # regex -> seconds used so far
+        self.truncated: set = set()               # regexes aborted for exceeding the budget
+
+        # set when a triage scan stopped before the end of the document
+        self.partial = False
+        self.chars_scanned = 0
+
+    def _tally(self, key: str, t0: float, matches: int, chars: int):
+        row = self.timings.setdefault(key, [0.0, 0, 0])
+        row[0] += time.perf_counter() - t0
+        row[1] += matches
+        row[2] += max(0, chars)
+
+    def _deadline(self, regex: str, now: float) -> float:
+        pattern_budget = REGEX_PATTERN_BUDGET_MS / 1000
+        pattern_left = pattern_budget - self.regex_spent.get(regex, 0.0)
+        # a pattern that overran its own budget (possible without the `regex`
+        # engine) is charged only up to that budget, so it cannot starve the rest
+        document_left = REGEX_DOCUMENT_BUDGET_MS / 1000 - sum(
+            min(s, pattern_budget) for s in self.regex_spent.values())
+        return now + min(pattern_left, document_left)
+
+    def feed(self, buf: str, blow: str, base: int = 0, start: int = 0, stop: int | None = None):
+        """Record hits starting in buf[start:stop]; `base` is buf's offset in the document."""
+        profiling = self.timings is not None
+        t0 = time.perf_counter() if profiling else 0.0
+        found = self.compiled.phrases.first_positions(blow, start, stop, skip=self.phrase_excerpts)
+        for phrase, idx in found.items():
+            self.phrase_excerpts[phrase] = "" if self.score_only else _snip(buf, idx, idx + len(phrase))
+        if profiling:
+            self._tally("phrases", t0, len(found), (len(blow) if stop is None else stop) - start)
+
+        for regex in self.compiled.patterns:
+            if regex in self.truncated:
+                continue
+            t0 = time.perf_counter()
+            # never start inside a match accepted from the previous window
+            begin = max(start, self._resume.get(regex, 0) - base)
+            excerpts = self.pattern_excerpts.setdefault(regex, [])
+            cnt, spans, end, truncated = self.compiled.count_pattern_matches(
+                regex, buf, begin, stop, keep=self.excerpt_cap - len(excerpts),
+                deadline=self._deadline(regex, t0))
+            self.regex_spent[regex] = self.regex_spent.get(regex, 0.0) + time.perf_counter() - t0
+            # without hard timeouts one slow match can run past the deadline and
+            # come back complete; the pattern is still over budget and is named
+            if truncated or self.regex_spent[regex] > REGEX_PATTERN_BUDGET_MS / 1000:
+                self.truncated.add(regex)
+            # excerpts only for the matches that are actually kept
+            excerpts.extend(_snip(buf, s, e) for s, e in spans)
+            if cnt:
+                self.pattern_counts[regex] = self.pattern_counts.get(regex, 0) + cnt
+                self._resume[regex] = base + end
+            if profiling:
+                self._tally(regex, t0, cnt, (len(buf) if stop is None else stop) - begin)
+
+
+def analyze_text(text: str, ruleset_name: str, score_only: bool = False,
+                 profile: bool = False) -> Dict[str, Any]:
     """Returns an auditor-friendly analysis object.
 
     IMPORTANT: This intentionally avoids storing the full document text in DB.
     Only short excerpts/snippets are stored.
+
+    score_only=True is for bulk triage: counts, score, risk level and
+    categories are computed as usual, but no excerpts, hits,
+    recommendations or compliance mapping are built.
+
+    profile=True adds a "profile" block with wall time, match count and
+    characters scanned per pattern, for the phrase pass and per scoring
+    phase, and feeds the same numbers to metrics.REGISTRY.
+    """
+    t = text or ""
+    state = _ScanState(get_compiled(ruleset_name), score_only=score_only, profile=profile)
+    state.feed(t, t.lower())
+    return _finalize(ruleset_name, state)
+
+
+def analyze_stream(chunks: Iterable[str], ruleset_name: str, overlap: int = STREAM_OVERLAP_CHARS,
+                   score_only: bool = False, profile: bool = False, stop_at_score: int | None = None,
+                   on_progress: Callable[[int, int], None] | None = None,
+                   extraction_warnings: List[str] | None = None) -> Dict[str, Any]:
+    """Same result as analyze_text("".join(chunks), ruleset_name) in bounded memory.
+
+    Chunks (e.g. pages from extractors.iter_text_from_file) are scanned as
+    they arrive. Only `overlap` characters are carried on each side of a
+    window boundary, so hits spanning two chunks are still found while peak
+    memory stays at roughly one chunk plus the overlap.
+
+    Triage: with stop_at_score set (e.g. HIGH_RISK_SCORE), scanning stops as
+    soon as the running score reaches it; the rest of `chunks` is never
+    pulled and the result carries partial_scan=True and chars_scanned.
+    on_progress(chars_scanned, running_score) is called after every window.
+
+    extraction_warnings is the list the extractor appends to while `chunks`
+    is read (extractors.iter_text_from_file(..., warnings)); if it ends up
+    non-empty it is copied into the result, since the text scanned may be
+    incomplete (e.g. OCR failed on scanned pages).
     """
     rs = RULESETS[ruleset_name]
+    check = _triage_check([rs], stop_at_score, on_progress)
+    state = _scan_stream(chunks, get_compiled(ruleset_name), overlap, score_only, profile, check)
+    return _with_warnings(_finalize(ruleset_name, state), extraction_warnings)
+
+
+def analyze_text_all(text: str, ruleset_names: List[str] | None = None,
+                     score_only: bool = False, profile: bool = False) -> Dict[str, Dict[str, Any]]:
+    """analyze_text under several rulesets (default: all) with a single scan.
+
+    Returns {ruleset_name: result}; each result is identical to
+    analyze_text(text, ruleset_name).
+    """
+    names = list(ruleset_names or RULESETS)
     t = text or ""
-    tlow = t.lower()
+    state = _ScanState(get_compiled(*names), score_only=score_only, profile=profile)
+    state.feed(t, t.lower())
+    return _finalize_all(names, state)
+
+
+def analyze_stream_all(chunks: Iterable[str], ruleset_names: List[str] | None = None,
+                       overlap: int = STREAM_OVERLAP_CHARS, score_only: bool = False,
+                       profile: bool = False, stop_at_score: int | None = None,
+                       on_progress: Callable[[int, int], None] | None = None,
+                       extraction_warnings: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+    """Streaming counterpart of analyze_text_all.
+
+    In triage mode the scan stops once every ruleset has reached
+    stop_at_score; on_progress receives the lowest running score.
+    """
+    names = list(ruleset_names or RULESETS)
+    check = _triage_check([RULESETS[n] for n in names], stop_at_score, on_progress)
+    state = _scan_stream(chunks, get_compiled(*names), overlap, score_only, profile, check)
+    return {name: _with_warnings(result, extraction_warnings)
+            for name, result in _finalize_all(names, state).items()}
+
+
+def _with_warnings(result: Dict[str, Any], extraction_warnings: List[str] | None) -> Dict[str, Any]:
+    if extraction_warnings:
+        result["extraction_warnings"] = list(extraction_warnings)
+    return result
+
+
+def _finalize_all(names: List[str], state: _ScanState) -> Dict[str, Dict[str, Any]]:
+    """_finalize per ruleset over one shared scan.
+
+    The phrase pass ran once for all rulesets: with profiling on it is
+    recorded once, under "shared/phrases", not in every ruleset's timings.
+    """
+    shared = len(names) > 1
+    results = {name: _finalize(name, state, shared_phrases=shared) for name in names}
+    if shared and state.timings is not None:
+        REGISTRY.record("shared/phrases", *state.timings.get("phrases", [0.0, 0, 0]))
+    return results
+
+
+def _triage_check(rulesets: List[Dict[str, Any]], stop_at_score: int | None,
+                  on_progress: Callable[[int, int], None] | None):
+    """Per-window callback for _scan_stream; returns True to stop scanning."""
+    if stop_at_score is None and on_progress is None:
+        return None
+
+    def check(state: _ScanState) -> bool:
+        score = min(_running_score(rs, state) for rs in rulesets)
+        if on_progress:
+            on_progress(state.chars_scanned, score)
+        return stop_at_score is not None and score >= stop_at_score
+
+    return check
+
+
+def _scan_stream(chunks: Iterable[str], compiled: CompiledRuleset, overlap: int,
+                 score_only: bool = False, profile: bool = False,
+                 check: Callable[[_ScanState], bool] | None = None) -> _ScanState:
+    overlap = max(overlap, compiled.phrases.max_len + 120)
+    state = _ScanState(compiled, score_only=score_only, profile=profile)
+
+    buf = ""
+    base = 0   # document offset of buf[0]
+    start = 0  # first position in buf not yet scanned
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf = buf + chunk if buf else chunk
+        stop = len(buf) - overlap
+        if stop <= start:
+            continue
+        state.feed(buf, buf.lower(), base, start, stop)
+        state.chars_scanned = base + stop
+        # keep `overlap` chars of left context for \b, lookbehinds and excerpts
+        keep_from = max(0, stop - overlap)
+        buf = buf[keep_from:]
+        base += keep_from
+        start = stop - keep_from
+        if check and check(state):
+            state.partial = True
+            break
+
+    if state.partial and hasattr(chunks, "close"):
+        # stop the extractor (e.g. a page generator) from doing further work
+        chunks.close()
+
+    state.feed(buf, buf.lower(), base, start)
+    state.chars_scanned = base + len(buf)
+    return state
+
+
+def _analyze_document(doc, ruleset_name: str, cache: bool = False,
+                      score_only: bool = False, stop_at_score: int | None = None,
+                      ocr_workers: int | None = None) -> Tuple[Dict[str, Any], Dict[str, Any] | None]:
+    # imported here so the engine itself stays free of extractor dependencies
+    from extractors import iter_text_from_file, load_document
+    from utils import file_meta
+
+    meta: Dict[str, Any] = {"filename": doc[0]} if isinstance(doc, tuple) else {"path": str(doc)}
+    try:
+        upload = load_document(doc)
+        meta = {**file_meta(upload.name, upload.getvalue()), **meta}
+
+        def run():
+            warnings: List[str] = []
+            return analyze_stream(iter_text_from_file(upload, warnings, ocr_workers), ruleset_name,
+                                  score_only=score_only, stop_at_score=stop_at_score,
+                                  extraction_warnings=warnings)
+
+        if cache and not score_only and stop_at_score is None:
+            from analysis_cache import cached_analysis
+            return meta, cached_analysis(meta["sha256"], ruleset_name, run)
+        return meta, run()
+    except Exception as e:
+        meta["error"] = f"{type(e).__name__}: {e}"
+        return meta, None
+
+
+def analyze_many(documents: Iterable, ruleset_name: str, workers: int | None = None,
+                 cache: bool = False, score_only: bool = False,
+                 stop_at_score: int | None = None) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any] | None]]:
+    """Extract and analyze many documents on a process pool.
+
+    `documents` yields file paths or (filename, bytes) pairs. Results come
+    back as (meta, analysis) in completion order, where `meta` matches the
+    Document Inspector's file metadata (plus "path" for path inputs) and
+    `analysis` is exactly what analyze_text returns. A document that fails to
+    extract yields analysis=None with the reason in meta["error"]; non-fatal
+    extraction problems (e.g. failed OCR) are in analysis["extraction_warnings"].
+
+    At most 2 * workers documents are in flight, so arbitrarily long inputs
+    never get loaded all at once. With cache=True, documents already analyzed
+    under the same ruleset version are served from analysis_cache.
+    score_only and stop_at_score are passed through to analyze_stream
+    (score-only and triage results are never cached). Documents analyzed on
+    the pool OCR in their own worker process (ocr_workers=1), so OCR memory
+    stays bounded by `workers` rather than workers x CPUs.
+    """
+    workers = workers or os.cpu_count() or 1
+    if cache:
+        from db import init_db
+        init_db()
+    if workers == 1:
+        for doc in documents:
+            yield _analyze_document(doc, ruleset_name, cache, score_only, stop_at_score)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for doc in documents:
+            pending.add(pool.submit(_analyze_document, doc, ruleset_name, cache, score_only,
+                                      stop_at_score, 1))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield fut.result()
+
+
+def _finalize(ruleset_name: str, state: _ScanState, shared_phrases: bool = False) -> Dict[str, Any]:
+    t_finalize = time.perf_counter()
+    rs = RULESETS[ruleset_name]
+    phrase_excerpts = state.phrase_excerpts
 
     hits: List[Hit] = []
 
     # 1) Explicit CUI / markings signals
     explicit_marking_phrases = rs.get("explicit_markings", [])
-    explicit_found = _contains_any(tlow, explicit_marking_phrases)
+    explicit_found = [p for p in explicit_marking_phrases if p in phrase_excerpts]
     if explicit_found:
         for p in explicit_found[:8]:
-            idx = tlow.find(p)
             hits.append(Hit(kind="keyword", name="explicit_marking",
-                            excerpt=_snip(t, idx, idx + len(p)),
+                            excerpt=phrase_excerpts[p],
                             confidence=0.92, category="Explicitly Marked CUI"))
 
     # 2) Context / handling language signals (even if markings missing)
     context_phrases = rs.get("context_phrases", [])
-    ctx_found = _contains_any(tlow, context_phrases)
+    ctx_found = [p for p in context_phrases if p in phrase_excerpts]
     if ctx_found:
         for p in ctx_found[:10]:
-            idx = tlow.find(p)
             hits.append(Hit(kind="context", name="handling_context",
-                            excerpt=_snip(t, idx, idx + len(p)),
+                            excerpt=phrase_excerpts[p],
                             confidence=0.80, category="Handling / Dissemination"))
 
     # 3) Rule-based patterns (regex)
@@ -75,8 +382,9 @@ def analyze_text(text: str, ruleset_name: str) -> Dict[str, Any]:
     cui_categories: Dict[str, float] = {}  # category -> confidence
 
     for pname, pdef in rs["patterns"].items():
-        cnt, snippets = _regex_hits(t, pname, pdef["regex"])
+        cnt = state.pattern_counts.get(pdef["regex"], 0)
         if cnt:
+            snippets = state.pattern_excerpts[pdef["regex"]]
             patterns_found[pname] = cnt
             cat = pdef.get("category")
             conf = float(pdef.get("confidence", 0.78))
@@ -102,37 +410,32 @@ def analyze_text(text: str, ruleset_name: str) -> Dict[str, Any]:
     # 5) Keyword triggers (legacy)
     kw_hits = []
     for kw in rs.get("keywords", []):
-        if kw in tlow:
+        if kw in phrase_excerpts:
             kw_hits.append(kw)
-            idx = tlow.find(kw)
             hits.append(Hit(kind="keyword", name="keyword_trigger",
-                            excerpt=_snip(t, idx, idx + len(kw)),
+                            excerpt=phrase_excerpts[kw],
                             confidence=0.72, category="Keyword Trigger"))
 
     # --- Scoring model ---
-    weights = rs["weights"]
-    score = 0.0
-    score += len(explicit_found) * weights["explicit_marking"]
-    score += min(len(ctx_found), 12) * weights["context"]
-    score += sum(patterns_found.values()) * weights["pattern"]
-    if missing_markings:
-        score += weights["missing_markings_bonus"]
-    score += len(kw_hits) * weights["keyword"]
-    if len(cui_categories) >= 2:
-        score += weights["multi_category_bonus"]
-
-    risk_score = int(clamp(score, 0, 100))
-    risk_level = "HIGH" if risk_score >= 70 else "MEDIUM" if risk_score >= 30 else "LOW"
+    risk_score = _score(rs["weights"], len(explicit_found), len(ctx_found), sum(patterns_found.values()),
+                        missing_markings, len(kw_hits), len(cui_categories))
+    risk_level = "HIGH" if risk_score >= HIGH_RISK_SCORE else "MEDIUM" if risk_score >= 30 else "LOW"
 
     cui_detected = bool(explicit_found or patterns_found or (ctx_found and missing_markings))
 
-    recommendations, compliance_map = _build_recommendations_and_mapping(
-        cui_detected=cui_detected,
-        risk_level=risk_level,
-        risk_score=risk_score,
-        categories=list(cui_categories.keys()),
-        missing_markings=missing_markings
-    )
+    t_scoring = time.perf_counter()
+
+    if state.score_only:
+        recommendations, compliance_map, hits = [], {}, []
+    else:
+        recommendations, compliance_map = _build_recommendations_and_mapping(
+            cui_detected=cui_detected,
+            risk_level=risk_level,
+            risk_score=risk_score,
+            categories=list(cui_categories.keys()),
+            missing_markings=missing_markings
+        )
+    t_recs = time.perf_counter()
 
     signals = []
     if explicit_found:
@@ -146,6 +449,19 @@ def analyze_text(text: str, ruleset_name: str) -> Dict[str, Any]:
     if not signals:
         signals.append("No strong indicators detected")
 
+    if state.partial:
+        signals.append(f"Triage: scan stopped at {state.chars_scanned:,} characters once the score "
+                       f"reached the threshold (remaining text not scanned)")
+
+    truncated = [pname for pname, pdef in rs["patterns"].items() if pdef["regex"] in state.truncated]
+    if truncated:
+        signals.append("Pattern scan truncated: regex execution budget exceeded (counts are partial)")
+    pattern_warnings = {
+        pname: state.compiled.warnings[pdef["regex"]]
+        for pname, pdef in rs["patterns"].items()
+        if pdef["regex"] in state.compiled.warnings
+    }
+
     categories_sorted = [
         {"category": c, "confidence": round(cui_categories[c], 2)}
         for c in sorted(cui_categories.keys(), key=lambda x: cui_categories[x], reverse=True)
@@ -159,7 +475,7 @@ def analyze_text(text: str, ruleset_name: str) -> Dict[str, Any]:
         "excerpt": h.excerpt
     } for h in hits[:40]]
 
-    return {
+    result = {
         "ruleset": ruleset_name,
         "cui_detected": bool(cui_detected),
         "risk_level": risk_level,
@@ -173,11 +489,126 @@ def analyze_text(text: str, ruleset_name: str) -> Dict[str, Any]:
         "keyword_triggers_hit": kw_hits,
         "missing_markings_heuristic": bool(missing_markings),
 
+        # raw inputs of the scoring model, so stored inspections can be re-scored
+        "signal_counts": {
+            "explicit_markings": len(explicit_found),
+            "context_phrases": len(ctx_found),
+            "patterns": sum(patterns_found.values()),
+            "keywords": len(kw_hits),
+            "categories": len(cui_categories),
+        },
+
         "recommendations": recommendations,
         "compliance_mapping": compliance_map,
 
         "hits": hits_compact
     }
+    if state.score_only:
+        result["score_only"] = True
+    if state.partial:
+        result["partial_scan"] = True
+        result["chars_scanned"] = state.chars_scanned
+    if truncated:
+        result["truncated_patterns"] = truncated
+    if pattern_warnings:
+        result["pattern_warnings"] = pattern_warnings
+    if state.timings is not None:
+        result["profile"] = _build_profile(
+            ruleset_name, state,
+            phrase_groups={
+                "explicit_markings": len(explicit_found),
+                "context_phrases": len(ctx_found),
+                "keywords": len(kw_hits),
+            },
+            scoring_s=t_scoring - t_finalize,
+            recommendations_s=t_recs - t_scoring,
+            shared_phrases=shared_phrases,
+        )
+    return result
+
+
+def _score(weights: Dict[str, float], n_explicit: int, n_context: int, n_patterns: int,
+           missing_markings: bool, n_keywords: int, n_categories: int) -> int:
+    score = 0.0
+    score += n_explicit * weights["explicit_marking"]
+    score += min(n_context, 12) * weights["context"]
+    score += n_patterns * weights["pattern"]
+    if missing_markings:
+        score += weights["missing_markings_bonus"]
+    score += n_keywords * weights["keyword"]
+    if n_categories >= 2:
+        score += weights["multi_category_bonus"]
+    return int(clamp(score, 0, 100))
+
+
+def _running_score(rs: Dict[str, Any], state: _ScanState) -> int:
+    """Risk score of the text scanned so far (what _finalize would report now)."""
+    seen = state.phrase_excerpts
+    n_explicit = sum(1 for p in rs.get("explicit_markings", []) if p in seen)
+    n_context = sum(1 for p in rs.get("context_phrases", []) if p in seen)
+    n_keywords = sum(1 for kw in rs.get("keywords", []) if kw in seen)
+    n_patterns = 0
+    categories = set()
+    for pdef in rs["patterns"].values():
+        cnt = state.pattern_counts.get(pdef["regex"], 0)
+        if cnt:
+            n_patterns += cnt
+            if pdef.get("category"):
+                categories.add(pdef["category"])
+    missing_markings = not n_explicit and bool(n_context or n_patterns)
+    return _score(rs["weights"], n_explicit, n_context, n_patterns, missing_markings,
+                  n_keywords, len(categories))
+
+
+def _build_profile(ruleset_name: str, state: _ScanState, *, phrase_groups: Dict[str, int],
+                   scoring_s: float, recommendations_s: float,
+                   shared_phrases: bool = False) -> Dict[str, Any]:
+    """Per-rule timings for one analysis; also recorded in metrics.REGISTRY.
+
+    With shared_phrases the phrase pass served several rulesets; its time is
+    reported as shared_phrase_scan_ms and left out of this ruleset's phases.
+    """
+    def ms(seconds):
+        return round(seconds * 1000, 3)
+
+    phrase_s, phrase_matches, chars = state.timings.get("phrases", [0.0, 0, 0])
+    if not shared_phrases:
+        REGISTRY.record(f"{ruleset_name}/phrases", phrase_s, phrase_matches, chars)
+
+    patterns = {}
+    pattern_s = 0.0
+    for pname, pdef in RULESETS[ruleset_name]["patterns"].items():
+        secs, matches, scanned = state.timings.get(pdef["regex"], [0.0, 0, 0])
+        pattern_s += secs
+        REGISTRY.record(f"{ruleset_name}/pattern:{pname}", secs, matches, scanned)
+        patterns[pname] = {
+            "regex": pdef["regex"],
+            "ms": ms(secs),
+            "matches": matches,
+            "chars_scanned": scanned,
+        }
+
+    REGISTRY.record(f"{ruleset_name}/phase:scoring", scoring_s)
+    REGISTRY.record(f"{ruleset_name}/phase:recommendations", recommendations_s)
+    total_s = time.perf_counter() - state.started
+    REGISTRY.record(f"{ruleset_name}/total", total_s, chars=chars)
+
+    profile = {
+        "total_ms": ms(total_s),
+        "chars_scanned": chars,
+        "phases": {
+            "phrase_scan_ms": 0.0 if shared_phrases else ms(phrase_s),
+            "pattern_scan_ms": ms(pattern_s),
+            "scoring_ms": ms(scoring_s),
+            "recommendations_ms": ms(recommendations_s),
+        },
+        # all phrase groups share one pass, so only their hit counts differ
+        "phrase_groups": {g: {"matches": n} for g, n in phrase_groups.items()},
+        "patterns": dict(sorted(patterns.items(), key=lambda kv: kv[1]["ms"], reverse=True)),
+    }
+    if shared_phrases:
+        profile["shared_phrase_scan_ms"] = ms(phrase_s)
+    return profile
 
 
 def _build_recommendations_and_mapping(*, cui_detected: bool, risk_level: str, risk_score: int,
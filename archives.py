@@ -0,0 +1,216 @@
+import io
+import zipfile
+
+from analysis_engine import analyze_many
+from artifacts import build_artifacts
+from db import get_connection, retry_on_busy
+from evidence_vault import insert_inspection
+from extractors import SUPPORTED_EXTENSIONS
+from utils import file_meta
+
+try:
+    from config import ARCHIVE_MAX_DEPTH, ARCHIVE_MAX_MEMBERS, ARCHIVE_MAX_TOTAL_BYTES
+except Exception:
+    ARCHIVE_MAX_DEPTH = 3
+    ARCHIVE_MAX_MEMBERS = 2000
+    ARCHIVE_MAX_TOTAL_BYTES = 1024 ** 3
+
+# -----------------------------
+# ZIP bundle ingestion
+# -----------------------------
+#
+# Members are read one at a time and handed to analysis_engine.analyze_many,
+# which keeps at most 2 * workers of them in flight. Nested zips are expanded
+# up to ARCHIVE_MAX_DEPTH. Expanded bytes are counted as they are actually
+# decompressed (header sizes are not trusted), so a zip bomb stops at
+# ARCHIVE_MAX_TOTAL_BYTES.
+
+ARCHIVE_EXTENSIONS = (".zip",)
+
+_READ_BLOCK = 1 << 20
+
+
+def is_archive(filename):
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+class _Budget:
+    def __init__(self, max_members, max_bytes):
+        self.members_left = max_members
+        self.bytes_left = max_bytes
+
+
+def _read_member(zf, info, budget):
+    """Member bytes, or None if reading it would exceed the expanded-size budget."""
+    out = bytearray()
+    with zf.open(info) as f:
+        while True:
+            block = f.read(_READ_BLOCK)
+            if not block:
+                break
+            out += block
+            if len(out) > budget.bytes_left:
+                return None
+    budget.bytes_left -= len(out)
+    return bytes(out)
+
+
+def iter_archive_members(data, archive_name, skipped, depth=0, budget=None):
+    """Yield (member path, bytes) for every supported document in a zip.
+
+    Member paths look like "bundle.zip/folder/file.pdf" (nested archives add
+    further segments). Anything not analyzed is appended to `skipped` as
+    {"path": ..., "reason": ...}.
+    """
+    budget = budget or _Budget(ARCHIVE_MAX_MEMBERS, ARCHIVE_MAX_TOTAL_BYTES)
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+    except zipfile.BadZipFile as e:
+        skipped.append({"path": archive_name, "reason": f"unreadable archive: {e}"})
+        return
+
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            path = f"{archive_name}/{info.filename}"
+            name = info.filename.lower()
+
+            if name.endswith(ARCHIVE_EXTENSIONS):
+                if depth + 1 > ARCHIVE_MAX_DEPTH:
+                    skipped.append({"path": path, "reason": "nesting depth limit reached"})
+                    continue
+            elif not name.endswith(SUPPORTED_EXTENSIONS):
+                skipped.append({"path": path, "reason": "unsupported file type"})
+                continue
+            elif budget.members_left <= 0:
+                skipped.append({"path": path, "reason": "member count limit reached"})
+                continue
+
+            if info.flag_bits & 0x1:
+                skipped.append({"path": path, "reason": "encrypted"})
+                continue
+            try:
+                content = _read_member(zf, info, budget)
+            except (zipfile.BadZipFile, NotImplementedError, OSError) as e:
+                skipped.append({"path": path, "reason": f"unreadable member: {e}"})
+                continue
+            if content is None:
+                skipped.append({"path": path, "reason": "expanded size limit reached"})
+                budget.bytes_left = 0
+                continue
+
+            if name.endswith(ARCHIVE_EXTENSIONS):
+                yield from iter_archive_members(content, path, skipped, depth + 1, budget)
+            else:
+                budget.members_left -= 1
+                yield path, content
+
+
+def rollup_analysis(ruleset_name, members):
+    """Parent-level analysis summarizing the member (meta, analysis) results."""
+    analyzed = [(m, a) for m, a in members if a is not None]
+    worst = max(analyzed, key=lambda ma: ma[1]["risk_score"], default=(None, None))[1]
+
+    patterns_found = {}
+    categories = {}
+    for _, a in analyzed:
+        for p, n in (a.get("patterns_found") or {}).items():
+            patterns_found[p] = patterns_found.get(p, 0) + int(n)
+        for c in a.get("cui_categories", []):
+            categories[c["category"]] = max(categories.get(c["category"], 0.0), c["confidence"])
+
+    flagged = [a for _, a in analyzed if a.get("cui_detected")]
+    errors = [m for m, a in members if a is None]
+    signals = [f"{len(flagged)} of {len(analyzed)} archive members contain CUI indicators"]
+    if errors:
+        signals.append(f"{len(errors)} archive members could not be analyzed")
+    warned = [a for _, a in analyzed if a.get("extraction_warnings")]
+    if warned:
+        signals.append(f"{len(warned)} archive members were analyzed with extraction warnings")
+
+    return {
+        "ruleset": ruleset_name,
+        "cui_detected": bool(flagged),
+        "risk_level": worst["risk_level"] if worst else "LOW",
+        "risk_score": worst["risk_score"] if worst else 0,
+        "signals": signals,
+        "patterns_found": patterns_found,
+        "detected_patterns": [],
+        "cui_categories": [
+            {"category": c, "confidence": conf}
+            for c, conf in sorted(categories.items(), key=lambda kv: kv[1], reverse=True)
+        ],
+        "keyword_triggers_hit": [],
+        "missing_markings_heuristic": any(a.get("missing_markings_heuristic") for a in flagged),
+        "recommendations": worst.get("recommendations", []) if worst else [],
+        "compliance_mapping": worst.get("compliance_mapping", {}) if worst else {},
+        "hits": [],
+        "archive_members": [{
+            "path": m["filename"],
+            "risk_level": a["risk_level"] if a else None,
+            "risk_score": a["risk_score"] if a else None,
+            "cui_detected": a["cui_detected"] if a else None,
+            "error": m.get("error"),
+            "extraction_warnings": a.get("extraction_warnings") if a else None,
+        } for m, a in members],
+    }
+
+
+def analyze_archive(upload, ruleset_name, workers=None, cache=False):
+    """Expand a zip upload and analyze its members on a worker pool.
+
+    Returns (parent meta, roll-up analysis, [(member meta, analysis)], skipped),
+    where member results are in archive order.
+    """
+    data = upload.getvalue()
+    parent_meta = file_meta(upload.name, data)
+    skipped = []
+
+    members = iter_archive_members(data, upload.name, skipped)
+
+    # member paths need not be unique (a zip may repeat a name), so results
+    # are matched back by member index, carried as a "<index>:" name prefix
+    def numbered():
+        for i, (path, content) in enumerate(members):
+            yield f"{i}:{path}", content
+
+    indexed = []
+    for meta, member_analysis in analyze_many(numbered(), ruleset_name, workers=workers, cache=cache):
+        i, _, meta["filename"] = meta["filename"].partition(":")
+        indexed.append((int(i), meta, member_analysis))
+    results = [(meta, a) for _, meta, a in sorted(indexed, key=lambda r: r[0])]
+
+    analysis = rollup_analysis(ruleset_name, results)
+    analysis["archive_skipped"] = skipped
+    return parent_meta, analysis, results, skipped
+
+
+@retry_on_busy
+def save_archive_inspection(parent_meta, parent_analysis, parent_artifacts, members, tenant_id=None):
+    """Store the parent inspection, one inspection per analyzed member, and the links.
+
+    Everything is written in one transaction, so a failure leaves no partial
+    archive behind. Returns the parent inspection id.
+    """
+    con = get_connection()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        parent_id = insert_inspection(con, parent_meta, parent_analysis, parent_artifacts, tenant_id)
+
+        links = []
+        for meta, analysis in members:
+            if analysis is None:
+                continue
+            child_id = insert_inspection(con, meta, analysis, build_artifacts(meta, analysis), tenant_id)
+            links.append((parent_id, child_id, meta["filename"]))
+
+        con.executemany("""
+            INSERT INTO inspection_members (parent_inspection_id, member_inspection_id, member_path)
+            VALUES (?, ?, ?)
+        """, links)
+        con.commit()
+    finally:
+        # rolls back if anything above failed
+        con.close()
+    return parent_id
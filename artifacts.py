@@ -1,6 +1,6 @@
+import csv
+import io
 import json
-import pandas as pd
-import streamlit as st
 from utils import now_iso
 
 
@@ -53,8 +53,12 @@ def build_artifacts(meta, analysis):
             "excerpt": dp.get("excerpt"),
         })
 
-    df = pd.DataFrame(rows)
-    summary_csv = df.to_csv(index=False).encode("utf-8")
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    summary_csv = buf.getvalue().encode("utf-8")
 
     rec_lines = ["CUI Inspector Recommendations", "==========================", ""]
     for i, r in enumerate(analysis.get("recommendations", []), 1):
@@ -71,6 +75,8 @@ def build_artifacts(meta, analysis):
 
 
 def artifacts_to_download_buttons(artifacts):
+    import streamlit as st
+
     if not artifacts:
         return
 
@@ -1,21 +1,22 @@
-from db import get_db
+from db import connection, retry_on_busy
 from utils import now_iso
 
+@retry_on_busy
 def log_event(user, action, target=""):
-    con = get_db()
-    con.execute(
-        """
-        INSERT INTO audit_log
-        (user_email, role, tenant_id, action, target, timestamp)
-        VALUES (?,?,?,?,?,?)
-        """,
-        (
-            user["email"],
-            user["role"],
-            user["tenant_id"],
-            action,
-            target,
-            now_iso(),
-        ),
-    )
-    con.commit()
+    with connection() as con:
+        con.execute(
+            """
+            INSERT INTO audit_log
+            (user_email, role, tenant_id, action, target, timestamp)
+            VALUES (?,?,?,?,?,?)
+            """,
+            (
+                user["email"],
+                user["role"],
+                user["tenant_id"],
+                action,
+                target,
+                now_iso(),
+            ),
+        )
+        con.commit()
@@ -1,5 +1,5 @@
 import streamlit as st
-from db import get_db
+from db import connection
 from utils import now_iso, verify_password
 
 def render_login():
@@ -16,14 +16,20 @@ def render_login():
             st.error("Invalid credentials")
 
 def login(email, password):
-    con = get_db()
-    row = con.execute(
-        "SELECT * FROM users WHERE email=? AND is_active=1",
-        (email,)
-    ).fetchone()
+    with connection() as con:
+        row = con.execute(
+            "SELECT * FROM users WHERE email=? AND is_active=1",
+            (email,)
+        ).fetchone()
 
-    if not row or not verify_password(password, row["password_hash"]):
-        return False
+        if not row or not verify_password(password, row["password_hash"]):
+            return False
+
+        con.execute(
+            "UPDATE users SET last_login_at=? WHERE id=?",
+            (now_iso(), row["id"]),
+        )
+        con.commit()
 
     st.session_state.user = {
         "email": row["email"],
@@ -31,12 +37,6 @@ def login(email, password):
         "tenant_id": row["tenant_id"],
         "user_id": row["id"],
     }
-
-    con.execute(
-        "UPDATE users SET last_login_at=? WHERE id=?",
-        (now_iso(), row["id"]),
-    )
-    con.commit()
     return True
 
 def require_login():
@@ -0,0 +1,326 @@
+"""Reproducible performance benchmarks for the CUI Inspector pipeline.
+
+Builds a synthetic corpus locally (dense SSNs, dense ten-digit numbers, long
+marking-free prose, a marked contract, a large PDF and a large DOCX), then
+times each pipeline stage in its own child process:
+
+    extract   extractors.extract_text_from_file
+    analyze   analysis_engine.analyze_text
+    artifacts artifacts.build_artifacts
+    persist   evidence_vault.save_inspection (temporary database)
+
+    python benchmarks.py --scale 1 --save-baseline bench_baseline.json
+    python benchmarks.py --scale 1 --compare bench_baseline.json --threshold 0.15
+
+--compare exits with status 1 when any stage's throughput drops, or its
+peak RSS grows, by more than the threshold, and with status 2 (no
+comparison) when the baseline was recorded on a different corpus or
+ruleset: results record every corpus file's name and size.
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+STAGES = ["extract", "analyze", "artifacts", "persist"]
+
+_WORDS = (
+    "contract deliverable schedule performance period option award vendor "
+    "invoice quantity review approval milestone engineering support services "
+    "program office technical data report requirement clause the of and to"
+).split()
+
+
+# -----------------------------
+# Synthetic corpus
+# -----------------------------
+
+def _prose(rng, n_words):
+    out = []
+    for i in range(n_words):
+        out.append(rng.choice(_WORDS))
+        if i % 14 == 13:
+            out.append(".\n")
+    return " ".join(out)
+
+
+def _dense_ssn(rng, n):
+    return "\n".join(
+        f"{rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}, employee record"
+        for _ in range(n)
+    )
+
+
+def _dense_ten_digit(rng, n):
+    # spreadsheet exported to text: ids, amounts and 5-char codes per row
+    return "\n".join(
+        f"{rng.randint(10**9, 10**10 - 1)}\t{rng.randint(1, 99999)}\tA{rng.randint(1000, 9999)}"
+        for _ in range(n)
+    )
+
+
+def _marked_contract(rng, n_words):
+    parts = ["CUI//SP-PRIV\nCONTROLLED UNCLASSIFIED INFORMATION\nDistribution Statement C."]
+    for _ in range(20):
+        parts.append(_prose(rng, n_words // 20))
+        parts.append("Export controlled under ITAR; need to know only. Do not distribute.")
+    return "\n".join(parts)
+
+
+def _pdf_string(s):
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Minimal text-only PDF writer (Helvetica, one Tj line per text line)."""
+    objs = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+            3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, page in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        lines = ["BT /F1 9 Tf 11 TL 36 806 Td"]
+        for line in page.splitlines()[:70]:
+            lines.append(f"({_pdf_string(line[:110])}) Tj T*")
+        lines.append("ET")
+        stream = "\n".join(lines).encode("latin-1", "replace")
+        objs[content_id] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objs[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                         b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % page_id)
+    objs[2] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for oid in sorted(objs):
+        offsets[oid] = len(out)
+        out += b"%d 0 obj\n" % oid + objs[oid] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    for oid in sorted(objs):
+        out += b"%010d 00000 n \n" % offsets[oid]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    Path(path).write_bytes(bytes(out))
+
+
+def write_docx(path, paragraphs):
+    """Minimal WordprocessingML package with one w:p per paragraph."""
+    ns = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    body = "".join(f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(p)}</w:t></w:r></w:p>" for p in paragraphs)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'))
+        zf.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>'))
+        zf.writestr("word/document.xml", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<w:document xmlns:w="{ns}"><w:body>{body}</w:body></w:document>'))
+
+
+def make_corpus(out_dir, scale=1.0, seed=1234):
+    """Write the synthetic corpus to out_dir; same scale and seed give identical files."""
+    rng = random.Random(seed)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    def n(x):
+        return max(1, int(x * scale))
+
+    (out / "dense_ssn.txt").write_text(_dense_ssn(rng, n(40000)), encoding="utf-8")
+    (out / "dense_ten_digit.txt").write_text(_dense_ten_digit(rng, n(80000)), encoding="utf-8")
+    (out / "clean_long.txt").write_text(_prose(rng, n(600000)), encoding="utf-8")
+    (out / "marked_contract.txt").write_text(_marked_contract(rng, n(200000)), encoding="utf-8")
+
+    pages = [_prose(rng, 700) + ("\nCUI need to know 123-45-6789" if i % 25 == 0 else "")
+             for i in range(n(400))]
+    write_pdf(out / "large.pdf", pages)
+
+    paragraphs = [_prose(rng, 60) for _ in range(n(8000))]
+    paragraphs[::500] = ["CUI//SP-PRIV Controlled Unclassified Information"] * len(paragraphs[::500])
+    write_docx(out / "large.docx", paragraphs)
+    return sorted(p for p in out.iterdir() if p.is_file())
+
+
+# -----------------------------
+# Stage runners (each in a fresh child process)
+# -----------------------------
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_stage(stage, files, ruleset, repeat, db_path):
+    from extractors import extract_text_from_file, load_document
+    from utils import file_meta
+
+    docs = [load_document(str(f)) for f in files]
+    total_bytes = sum(d.size for d in docs)
+
+    def extract_all():
+        return [extract_text_from_file(d) for d in docs]
+
+    texts = extract_all() if stage != "extract" else None
+
+    if stage in ("artifacts", "persist"):
+        from analysis_engine import analyze_text
+        from artifacts import build_artifacts
+        metas = [file_meta(d.name, d.getvalue()) for d in docs]
+        analyses = [analyze_text(t, ruleset) for t in texts]
+        artifacts = [build_artifacts(m, a) for m, a in zip(metas, analyses)]
+        if stage == "artifacts":
+            total_bytes = sum(len(b) for arts in artifacts for b in arts.values())
+
+    if stage == "extract":
+        work = extract_all
+    elif stage == "analyze":
+        from analysis_engine import analyze_text
+        total_bytes = sum(len(t.encode("utf-8")) for t in texts)
+
+        def work():
+            return [analyze_text(t, ruleset) for t in texts]
+    elif stage == "artifacts":
+        def work():
+            return [build_artifacts(m, a) for m, a in zip(metas, analyses)]
+    else:
+        import blob_store
+        import db
+        from evidence_vault import save_inspection
+        total_bytes = sum(len(b) for arts in artifacts for b in arts.values())
+
+        def prepare(run):
+            # fresh database and blob store per run: a second run into the same
+            # store would only bump refcounts of blobs the first one wrote
+            db.DB_PATH = Path(f"{db_path}.{run}")
+            blob_store.BLOB_STORE_DIR = f"{db_path}.{run}_blobs"
+            db.init_db()
+
+        def work():
+            for m, a, arts in zip(metas, analyses, artifacts):
+                save_inspection(m, a, arts)
+
+    rss_before = _peak_rss_mb()
+    times = []
+    for run in range(repeat):
+        if stage == "persist":
+            prepare(run)
+        t0 = time.perf_counter()
+        work()
+        times.append(time.perf_counter() - t0)
+    best = min(times)
+    peak = _peak_rss_mb()
+    return {
+        "seconds": round(best, 4),
+        "docs": len(docs),
+        "mb": round(total_bytes / 1e6, 3),
+        "mb_per_s": round(total_bytes / 1e6 / best, 3) if best else None,
+        "docs_per_s": round(len(docs) / best, 3) if best else None,
+        "peak_rss_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - rss_before, 1),
+    }
+
+
+def run_benchmarks(corpus_dir, stages=STAGES, ruleset="DoD / GovCon", repeat=3):
+    files = sorted(p for p in Path(corpus_dir).iterdir() if p.is_file())
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for stage in stages:
+            db_path = str(Path(tmp) / f"{stage}.db")
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results[stage] = pool.submit(_run_stage, stage, files, ruleset, repeat, db_path).result()
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ruleset": ruleset,
+        "corpus": [{"name": f.name, "bytes": f.stat().st_size} for f in files],
+        "stages": results,
+    }
+
+
+def baseline_mismatch(current, baseline):
+    """Why results cannot be compared with baseline (different corpus or ruleset), or None."""
+    if baseline.get("corpus") != current["corpus"]:
+        return "baseline was recorded on a different corpus (file names or sizes differ)"
+    if baseline.get("ruleset") != current["ruleset"]:
+        return f"baseline ruleset {baseline.get('ruleset')!r} differs from {current['ruleset']!r}"
+    return None
+
+
+def compare(current, baseline, threshold):
+    """Regression messages for stages slower / larger than baseline by more than threshold."""
+    problems = []
+    for stage, cur in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        if base.get("mb_per_s") and cur.get("mb_per_s") is not None:
+            if cur["mb_per_s"] < base["mb_per_s"] * (1 - threshold):
+                problems.append(f"{stage}: throughput {cur['mb_per_s']} MB/s vs baseline {base['mb_per_s']} MB/s")
+        if base.get("peak_rss_mb") and cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            problems.append(f"{stage}: peak RSS {cur['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']} MB")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark extraction, analysis, artifacts and persistence.")
+    ap.add_argument("--corpus", help="corpus directory (default: generate into a temp dir)")
+    ap.add_argument("--scale", type=float, default=1.0, help="corpus size multiplier")
+    ap.add_argument("--stages", default=",".join(STAGES))
+    ap.add_argument("--ruleset", default="DoD / GovCon")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per stage; the best is reported")
+    ap.add_argument("--save-baseline", help="write results to this JSON file")
+    ap.add_argument("--compare", help="baseline JSON file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed regression fraction")
+    args = ap.parse_args(argv)
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        ap.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = args.corpus or tmp
+        generated = not args.corpus or not any(Path(corpus).iterdir())
+        if generated:
+            make_corpus(corpus, args.scale)
+        results = run_benchmarks(corpus, stages, args.ruleset, args.repeat)
+    # a pre-built corpus may have been generated at any scale; "corpus" identifies it
+    results["scale"] = args.scale if generated else None
+
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        mismatch = baseline_mismatch(results, baseline)
+        if mismatch:
+            print(f"cannot compare: {mismatch}", file=sys.stderr)
+            sys.exit(2)
+        problems = compare(results, baseline, args.threshold)
+        for p in problems:
+            print(f"REGRESSION {p}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Content-addressed artifact store.
+
+Artifact bytes live on disk under their sha256, sharded two levels deep
+(blobs/ab/cd/abcd...). SQLite keeps only metadata: artifacts rows point at
+a blob by sha256 and the blobs table counts how many artifacts reference
+each one, so identical artifacts (e.g. the same compliance_mapping.json
+for every CUI-positive document) are stored once.
+
+Blob files are written, and unreferenced ones removed, only while the
+caller holds the database write lock (BEGIN IMMEDIATE); that keeps gc()
+from deleting a file another session is about to reference.
+
+    python blob_store.py --migrate   # move inline artifacts.content into the store
+    python blob_store.py --gc        # delete blobs no artifact references
+"""
+import argparse
+import json
+import mmap
+import os
+import tempfile
+from pathlib import Path
+
+import db
+from storage_codec import IDENTITY, decode, encode, encode_as, iter_decode
+from utils import now_iso
+
+try:
+    from config import BLOB_STORE_DIR
+except Exception:
+    BLOB_STORE_DIR = None   # default: "<db name>_blobs" next to the database
+
+_MIGRATE_BATCH = 500
+_READ_BLOCK = 1 << 20
+
+
+def blob_root():
+    if BLOB_STORE_DIR:
+        return Path(BLOB_STORE_DIR)
+    return db.DB_PATH.parent / f"{db.DB_PATH.stem}_blobs"
+
+
+def blob_path(sha256):
+    return blob_root() / sha256[:2] / sha256[2:4] / sha256
+
+
+def _write_file(sha256, content):
+    path = blob_path(sha256)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def put_blob(con, sha256, content, codec=None):
+    """Add one reference to a blob, writing the file if it is new.
+
+    `content` is the uncompressed bytes whose hash is sha256. Returns the
+    codec the stored file uses: an existing blob keeps the codec it was
+    written with. Call inside the caller's write transaction; the
+    reference is durable when that transaction commits.
+    """
+    row = con.execute("SELECT codec FROM blobs WHERE sha256=?", (sha256,)).fetchone()
+    if row is not None:
+        if not blob_path(sha256).exists():
+            # lost file: restore it in the codec existing artifacts rows expect
+            data = encode_as(content, row[0])
+            _write_file(sha256, data)
+            con.execute("UPDATE blobs SET stored_bytes=? WHERE sha256=?", (len(data), sha256))
+        con.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256=?", (sha256,))
+        return row[0]
+    data, codec = encode(content, codec)
+    _write_file(sha256, data)
+    con.execute("""
+        INSERT INTO blobs (sha256, size_bytes, stored_bytes, codec, refcount, created_at)
+        VALUES (?, ?, ?, ?, 1, ?)
+    """, (sha256, len(content), len(data), codec, now_iso()))
+    return codec
+
+
+def release_blob(con, sha256):
+    """Drop one reference; the file itself goes at the next gc()."""
+    con.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256=?", (sha256,))
+
+
+def open_blob(sha256):
+    """Binary file handle on a blob's stored (possibly compressed) bytes."""
+    return open(blob_path(sha256), "rb")
+
+
+def read_blob(sha256, codec=IDENTITY):
+    with open_blob(sha256) as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return decode(m, codec) if codec != IDENTITY else m[:]
+
+
+def _iter_file(sha256):
+    with open_blob(sha256) as f:
+        while True:
+            block = f.read(_READ_BLOCK)
+            if not block:
+                return
+            yield block
+
+
+def artifact_bytes(row):
+    """Uncompressed content of an artifacts row, stored inline or in the blob store."""
+    if row["storage"] == "blob":
+        return read_blob(row["sha256"], row["codec"])
+    return decode(row["content"], row["codec"])
+
+
+def iter_artifact(row):
+    """Uncompressed content of an artifacts row in blocks (zip bundles, scrubbing)."""
+    if row["storage"] == "blob":
+        return iter_decode(_iter_file(row["sha256"]), row["codec"])
+    return iter([decode(row["content"], row["codec"])])
+
+
+def artifact_size(row):
+    """Uncompressed size; blob rows need blobs.size_bytes joined in as size_bytes."""
+    if row["storage"] == "blob":
+        return row["size_bytes"] or 0
+    return len(decode(row["content"], row["codec"]))
+
+
+# -----------------------------
+# Maintenance
+# -----------------------------
+
+def delete_inspection(con, inspection_id):
+    """Delete an inspection, its artifacts and archive links; releases their blobs.
+
+    Runs in its own write transaction.
+    """
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        for (sha,) in con.execute(
+            "SELECT sha256 FROM artifacts WHERE inspection_id=? AND storage='blob'", (inspection_id,)
+        ).fetchall():
+            release_blob(con, sha)
+        con.execute("DELETE FROM artifacts WHERE inspection_id=?", (inspection_id,))
+        con.execute("DELETE FROM inspection_members WHERE parent_inspection_id=? OR member_inspection_id=?",
+                    (inspection_id, inspection_id))
+        con.execute("DELETE FROM inspections WHERE id=?", (inspection_id,))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def gc(con, orphans=False):
+    """Remove unreferenced blobs; returns (files removed, bytes freed).
+
+    With orphans=True also remove files that have no blobs row at all
+    (left behind by a crash between writing a file and committing).
+    """
+    removed, freed = 0, 0
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        dead = con.execute("""
+            SELECT sha256, COALESCE(stored_bytes, size_bytes) FROM blobs WHERE refcount <= 0
+        """).fetchall()
+        for sha, size in dead:
+            try:
+                blob_path(sha).unlink()
+                removed += 1
+                freed += size
+            except FileNotFoundError:
+                pass
+        con.executemany("DELETE FROM blobs WHERE sha256=?", [(sha,) for sha, _ in dead])
+
+        if orphans and blob_root().exists():
+            for path in blob_root().glob("??/??/*"):
+                name = path.name
+                if name.startswith(".tmp-") or not con.execute(
+                    "SELECT 1 FROM blobs WHERE sha256=?", (name,)
+                ).fetchone():
+                    freed += path.stat().st_size
+                    path.unlink()
+                    removed += 1
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return removed, freed
+
+
+def migrate_inline(con):
+    """Move artifacts still stored in artifacts.content into the blob store."""
+    moved = 0
+    while True:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            rows = con.execute("""
+                SELECT id, sha256, codec, content FROM artifacts WHERE storage='db' LIMIT ?
+            """, (_MIGRATE_BATCH,)).fetchall()
+            for r in rows:
+                codec = put_blob(con, r["sha256"], decode(r["content"], r["codec"]))
+                con.execute("UPDATE artifacts SET storage='blob', codec=?, content=NULL WHERE id=?",
+                            (codec, r["id"]))
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        moved += len(rows)
+        if len(rows) < _MIGRATE_BATCH:
+            return moved
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Artifact blob store maintenance.")
+    ap.add_argument("--migrate", action="store_true", help="move inline artifact bytes into the store")
+    ap.add_argument("--gc", action="store_true", help="delete unreferenced blobs")
+    ap.add_argument("--orphans", action="store_true", help="with --gc, also delete files with no blobs row")
+    args = ap.parse_args(argv)
+
+    db.init_db()
+    with db.connection() as con:
+        out = {}
+        if args.migrate:
+            out["migrated"] = migrate_inline(con)
+        if args.gc:
+            out["removed"], out["bytes_freed"] = gc(con, orphans=args.orphans)
+        if args.migrate:
+            # the rows are gone; give the pages back to the filesystem
+            con.execute("VACUUM")
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,22 @@
-import json
 import streamlit as st
 from db import get_connection
+from storage_codec import load_json
 
 def render_compare_page():
     st.header("🆚 Compare Inspections")
 
     con = get_connection()
+    tenant_id = st.session_state.get("active_tenant")
     rows = con.execute("""
         SELECT id, filename, risk_level, risk_score, created_at
         FROM inspections
+        WHERE tenant_id IS ?
         ORDER BY created_at DESC
         LIMIT 200
-    """).fetchall()
+    """, (tenant_id,)).fetchall()
 
     if len(rows) < 2:
+        con.close()
         st.info("At least two inspections required.")
         return
 
@@ -26,12 +29,13 @@ def render_compare_page():
     right = st.selectbox("Right", list(labels.keys()), key="cmp_r")
 
     if labels[left] == labels[right]:
+        con.close()
         st.warning("Select two different inspections.")
         return
 
     def load(i):
-        row = con.execute("SELECT * FROM inspections WHERE id=?", (i,)).fetchone()
-        analysis = json.loads(row["analysis_json"])
+        row = con.execute("SELECT * FROM inspections WHERE id=? AND tenant_id IS ?", (i, tenant_id)).fetchone()
+        analysis = load_json(row["analysis_json"], row["analysis_codec"])
         arts = con.execute("SELECT name, sha256 FROM artifacts WHERE inspection_id=?", (i,)).fetchall()
         return row, analysis, arts
 
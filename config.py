@@ -3,3 +3,60 @@ TESSERACT_CMD = ""      # blank = default
 POPPLER_PATH = None     # blank = default
 OCR_DPI = 300
 OCR_LANGUAGE = "eng"
+OCR_WORKERS = 0           # OCR processes per extraction in the main process; 0 = one per CPU
+                          # (analyze_many / service pool workers OCR in their own process)
+OCR_BATCH_PAGES = 4       # pages rendered per worker task
+OCR_MIN_PAGE_CHARS = 40   # pages with less extractable text than this are OCR'd
+OCR_CACHE_MAX_ENTRIES = 50000   # per-page OCR results kept (keyed by page image hash)
+
+# SQLite connection reuse (db.py)
+DB_POOL_SIZE = 4                           # idle connections kept per process; not a cap on open ones
+DB_BUSY_TIMEOUT_MS = 5000
+DB_CACHE_SIZE_KB = 64 * 1024               # page cache per connection
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_RETRY_ATTEMPTS = 5                      # retry_on_busy attempts for writes
+
+# Analysis cache (keyed by file sha256 + ruleset fingerprint + engine version)
+ANALYSIS_CACHE_MAX_ENTRIES = 5000
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Regex execution budget per analyzed document (milliseconds)
+REGEX_PATTERN_BUDGET_MS = 2000     # any single ruleset pattern
+REGEX_DOCUMENT_BUDGET_MS = 10000   # all patterns together
+
+# Archive (ZIP) ingestion guards
+ARCHIVE_MAX_DEPTH = 3                      # zips inside zips
+ARCHIVE_MAX_MEMBERS = 2000                 # documents analyzed per upload
+ARCHIVE_MAX_TOTAL_BYTES = 1024 ** 3        # expanded bytes per upload
+
+# Watch-folder daemon (watcher.py)
+WATCH_FOLDERS = []               # e.g. ["/mnt/share/contracts"]
+WATCH_INTERVAL_SECONDS = 300
+
+# Local HTTP analysis service (service.py)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 0                        # pool processes; 0 = one per CPU
+SERVICE_MAX_QUEUE = 256                    # queued requests before answering 503
+SERVICE_BATCH_SIZE = 16                    # requests per micro-batch
+SERVICE_BATCH_WAIT_MS = 5                  # max wait for a batch to fill
+SERVICE_BATCH_MAX_BYTES = 4 * 1024 * 1024
+SERVICE_TENANT_CONCURRENCY = 8             # open requests per X-Tenant-ID before 429
+SERVICE_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Artifact blob store (blob_store.py); None = "<db name>_blobs" next to the database
+BLOB_STORE_DIR = None
+
+# Evidence Vault page
+VAULT_PAGE_SIZE = 50                       # inspections per page
+
+# Integrity scrubber (scrubber.py)
+SCRUB_BATCH_SIZE = 200                     # artifacts per batch
+SCRUB_PAUSE_SECONDS = 0.5                  # sleep between batches
+SCRUB_MAX_BYTES_PER_SECOND = 50 * 1024 * 1024
+SCRUB_REVERIFY_DAYS = 7                    # re-hash artifacts verified longer ago than this
+SCRUB_INTERVAL_SECONDS = 3600
+
+# Stored inspection JSON / artifact compression (storage_codec.py)
+STORAGE_CODEC = "zlib"                     # "identity" to store uncompressed
+STORAGE_COMPRESSION_LEVEL = 6
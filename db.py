@@ -1,13 +1,144 @@
+import functools
+import os
+import random
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    from config import (
+        DB_POOL_SIZE, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_RETRY_ATTEMPTS,
+    )
+except Exception:
+    DB_POOL_SIZE = 4
+    DB_BUSY_TIMEOUT_MS = 5000
+    DB_CACHE_SIZE_KB = 64 * 1024
+    DB_MMAP_SIZE = 256 * 1024 * 1024
+    DB_RETRY_ATTEMPTS = 5
+
 DB_PATH = Path("cui_inspector.db")
 
-def get_db():
-    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+# -----------------------------
+# Reused connections
+# -----------------------------
+#
+# get_db() reuses an idle connection of this process if there is one and
+# otherwise opens a new one; close() rolls back anything uncommitted and
+# keeps the connection for reuse instead of closing it. This is a cache of
+# idle connections, not a bounded pool: get_db() never waits, any number of
+# connections may be checked out at once, and DB_POOL_SIZE only limits how
+# many idle ones are kept. Idle connections are shared by all threads of the
+# process (Streamlit runs every rerun on a fresh thread), and a connection
+# is only ever used by the thread that checked it out. Connections run in
+# WAL mode, so writers from concurrent sessions no longer block readers.
+#
+# SQLite connections must never be used across fork(): a forked child
+# (e.g. ProcessPoolExecutor workers with analysis caching) starts with an
+# empty pool, and connections inherited from the parent are neither used
+# nor closed there.
+
+_lock = threading.Lock()
+_pools = {}         # (pid, db path) -> [idle connections]
+_inherited = []     # parent connections after fork; kept referenced so they are never closed
+
+
+class PooledConnection(sqlite3.Connection):
+    _pool_key = None
+
+    def close(self):
+        if self._pool_key is None or self._pool_key[0] != os.getpid():
+            if self._pool_key is not None:
+                _inherited.append(self)
+                return
+            super().close()
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.row_factory = sqlite3.Row
+        with _lock:
+            idle = _pools.setdefault(self._pool_key, [])
+            if len(idle) < DB_POOL_SIZE and self not in idle:
+                idle.append(self)
+                return
+        super().close()
+
+    def discard(self):
+        """Close for real (e.g. after a connection-level error)."""
+        super().close()
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    for idle in _pools.values():
+        _inherited.extend(idle)
+    _pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _connect(path):
+    con = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000, factory=PooledConnection,
+                          check_same_thread=False)
     con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+    con.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE)}")
+    con.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+    con.execute("PRAGMA temp_store=MEMORY")
+    return con
+
+
+def get_db():
+    key = (os.getpid(), str(DB_PATH))
+    with _lock:
+        idle = _pools.get(key)
+        if idle:
+            return idle.pop()
+    con = _connect(DB_PATH)
+    con._pool_key = key
     return con
 
+
+def get_connection():
+    return get_db()
+
+
+@contextmanager
+def connection():
+    """with connection() as con: ... -- always returned to the pool, uncommitted work rolled back."""
+    con = get_db()
+    try:
+        yield con
+    finally:
+        con.close()
+
+
+def is_busy_error(e):
+    return isinstance(e, sqlite3.OperationalError) and (
+        "locked" in str(e) or "busy" in str(e)
+    )
+
+
+def retry_on_busy(fn):
+    """Retry a self-contained write (opens, commits and closes its own connection)
+    when SQLite reports the database as busy/locked beyond the busy timeout."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(DB_RETRY_ATTEMPTS):
+            try:
+                return fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == DB_RETRY_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.05 * (2 ** attempt) * (1 + random.random()))
+    return wrapper
+
 def init_db():
     con = get_db()
 
@@ -39,6 +170,59 @@ def init_db():
         target TEXT,
         timestamp TEXT
     );
+
+    CREATE TABLE IF NOT EXISTS analysis_cache (
+        file_sha256 TEXT NOT NULL,
+        ruleset TEXT NOT NULL,
+        ruleset_fingerprint TEXT NOT NULL,
+        engine_version TEXT NOT NULL,
+        analysis_json TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        created_at TEXT,
+        last_used_at TEXT,
+        PRIMARY KEY (file_sha256, ruleset, ruleset_fingerprint, engine_version)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_analysis_cache_lru
+        ON analysis_cache (last_used_at);
+
+    CREATE TABLE IF NOT EXISTS ocr_cache (
+        image_sha256 TEXT NOT NULL,
+        lang TEXT NOT NULL,
+        dpi INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        created_at TEXT,
+        last_used_at TEXT,
+        PRIMARY KEY (image_sha256, lang, dpi)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_ocr_cache_lru
+        ON ocr_cache (last_used_at);
+
+    CREATE TABLE IF NOT EXISTS file_index (
+        path TEXT NOT NULL,
+        ruleset TEXT NOT NULL,
+        ruleset_fingerprint TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        sha256 TEXT NOT NULL,
+        last_inspection_id INTEGER,
+        last_error TEXT,
+        last_scanned_at TEXT,
+        PRIMARY KEY (path, ruleset)
+    );
+
+    CREATE TABLE IF NOT EXISTS inspection_members (
+        parent_inspection_id INTEGER NOT NULL,
+        member_inspection_id INTEGER NOT NULL,
+        member_path TEXT NOT NULL,
+        PRIMARY KEY (parent_inspection_id, member_inspection_id)
+    );
     """)
 
     con.commit()
+
+    # inspections / artifacts and their indexes are versioned (see migrations.py)
+    from migrations import migrate
+    migrate(con)
+    con.close()
@@ -1,26 +1,54 @@
 import json
 import hashlib
-import streamlit as st
+import zlib
 
-from db import get_connection
+from blob_store import artifact_bytes, put_blob
+from db import get_connection, retry_on_busy
+from scrubber import latest_root
+from storage_codec import dump_json, load_json
 from utils import now_iso
 
+try:
+    from config import VAULT_PAGE_SIZE
+except Exception:
+    VAULT_PAGE_SIZE = 50
 
-def save_inspection(meta, analysis, artifacts):
+
+@retry_on_busy
+def save_inspection(meta, analysis, artifacts, tenant_id=None):
+    """Store one inspection and its artifacts; returns the new inspection id.
+
+    Artifact bytes go to the blob store; the artifacts rows hold only metadata.
+    """
     con = get_connection()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        inspection_id = insert_inspection(con, meta, analysis, artifacts, tenant_id)
+        con.commit()
+    finally:
+        # rolls back if anything above failed
+        con.close()
+    return inspection_id
+
+
+def insert_inspection(con, meta, analysis, artifacts, tenant_id=None):
+    """save_inspection inside the caller's write transaction (BEGIN IMMEDIATE)."""
+    analysis_json, analysis_codec = dump_json(analysis)
     cur = con.cursor()
-
     cur.execute("""
         INSERT INTO inspections
-        (filename, sha256, ruleset, risk_level, risk_score, analysis_json, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        (tenant_id, filename, sha256, ruleset, risk_level, risk_score,
+         analysis_json, analysis_codec, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (
+        tenant_id,
         meta["filename"],
         meta["sha256"],
         analysis["ruleset"],
         analysis["risk_level"],
         analysis["risk_score"],
-        json.dumps(analysis),
+        analysis_json,
+        analysis_codec,
         now_iso()
     ))
 
@@ -28,46 +56,116 @@ def save_inspection(meta, analysis, artifacts):
 
     for name, content in artifacts.items():
         h = hashlib.sha256(content).hexdigest()
+        codec = put_blob(con, h, content)
         cur.execute("""
             INSERT INTO artifacts
-            (inspection_id, name, sha256, content, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        """, (inspection_id, name, h, content, now_iso()))
-
-    con.commit()
-    con.close()
+            (inspection_id, name, sha256, storage, codec, created_at)
+            VALUES (?, ?, ?, 'blob', ?, ?)
+        """, (inspection_id, name, h, codec, now_iso()))
+    return inspection_id
+
+
+def vault_page(con, tenant_id, before=None, limit=VAULT_PAGE_SIZE):
+    """One page of inspection summaries, newest first.
+
+    Keyset pagination on (created_at, id): `before` is the key of the last
+    row of the previous page. Returns (rows, key of the next page or None).
+    """
+    if before is None:
+        rows = con.execute("""
+            SELECT id, filename, risk_level, risk_score, created_at
+            FROM inspections
+            WHERE tenant_id IS ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, (tenant_id, limit + 1)).fetchall()
+    else:
+        rows = con.execute("""
+            SELECT id, filename, risk_level, risk_score, created_at
+            FROM inspections
+            WHERE tenant_id IS ? AND (created_at, id) < (?, ?)
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        """, (tenant_id, before[0], before[1], limit + 1)).fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1]["created_at"], rows[-1]["id"])
+    return rows, None
+
+
+def verify_artifacts(con, inspection_id):
+    """Re-hash an inspection's stored artifacts: [(name, "ok" | "mismatch" | "missing")]."""
+    results = []
+    for a in con.execute("""
+        SELECT name, sha256, storage, codec, content FROM artifacts WHERE inspection_id=?
+    """, (inspection_id,)).fetchall():
+        try:
+            h = hashlib.sha256(artifact_bytes(a)).hexdigest()
+        except OSError:
+            results.append((a["name"], "missing"))
+            continue
+        except (zlib.error, ValueError):
+            # stored bytes no longer decode: tampered or corrupted
+            results.append((a["name"], "mismatch"))
+            continue
+        results.append((a["name"], "ok" if h == a["sha256"] else "mismatch"))
+    return results
 
 
 def render_evidence_vault():
+    import streamlit as st
+
     st.header("📦 Evidence Vault")
 
+    tenant_id = st.session_state.get("active_tenant")
+    # keys of the pages before the current one; reset when the tenant changes
+    if st.session_state.get("vault_tenant") != tenant_id:
+        st.session_state.vault_tenant = tenant_id
+        st.session_state.vault_pages = [None]
+    pages = st.session_state.vault_pages
+
     con = get_connection()
-    rows = con.execute("""
-        SELECT id, filename, risk_level, risk_score, created_at
-        FROM inspections
-        ORDER BY created_at DESC
-    """).fetchall()
+    rows, next_key = vault_page(con, tenant_id, pages[-1])
 
-    if not rows:
+    if not rows and len(pages) == 1:
+        con.close()
         st.info("No inspections stored yet.")
         return
 
+    root = latest_root(con, tenant_id)
+    if root:
+        status = json.loads(root["status_json"] or "{}")
+        st.markdown(f"**Vault Merkle root** ({root['artifact_count']} artifacts, computed {root['computed_at']})")
+        st.code(root["root"], language=None)
+        if status.get("mismatch") or status.get("missing"):
+            st.error(f"Integrity scrub: {status.get('mismatch', 0)} mismatched, "
+                     f"{status.get('missing', 0)} missing artifacts")
+        else:
+            st.caption(f"Integrity scrub: {status.get('ok', 0)} verified, {status.get('unverified', 0)} pending")
+    else:
+        st.caption("No Merkle root yet: run `python scrubber.py --once`.")
+
+    st.caption(f"Page {len(pages)}")
+
     for r in rows:
         with st.expander(
             f"#{r['id']} • {r['filename']} • {r['risk_level']} ({r['risk_score']})"
         ):
             st.caption(f"Created at: {r['created_at']}")
 
-            analysis = json.loads(
-                con.execute(
-                    "SELECT analysis_json FROM inspections WHERE id=?",
-                    (r["id"],)
-                ).fetchone()[0]
-            )
-            st.json(analysis)
+            # expander bodies run even when collapsed: load details only on request
+            if not st.checkbox("Show analysis and artifacts", key=f"v_open_{r['id']}"):
+                continue
+
+            stored = con.execute(
+                "SELECT analysis_json, analysis_codec FROM inspections WHERE id=?",
+                (r["id"],)
+            ).fetchone()
+            analysis = load_json(stored["analysis_json"], stored["analysis_codec"])
+            st.json(analysis, expanded=False)
 
             arts = con.execute("""
-                SELECT name, sha256, content
+                SELECT name, sha256, storage, codec, content
                 FROM artifacts
                 WHERE inspection_id=?
             """, (r["id"],)).fetchall()
@@ -75,22 +173,41 @@ def render_evidence_vault():
             st.subheader("Artifacts")
 
             for a in arts:
+                try:
+                    content = artifact_bytes(a)
+                except OSError:
+                    st.error(f"{a['name']}: stored content is missing")
+                    continue
+                except (zlib.error, ValueError):
+                    st.error(f"{a['name']}: stored content is corrupted")
+                    continue
+
                 # 🔑 UNIQUE KEY FIX (this is the important part)
                 download_key = f"dl_{r['id']}_{a['name']}"
 
                 st.download_button(
                     label=f"⬇ Download {a['name']}",
-                    data=a["content"],
+                    data=content,
                     file_name=a["name"],
                     key=download_key
                 )
+                st.caption(f"SHA-256 {a['sha256']}")
 
-                recomputed = hashlib.sha256(a["content"]).hexdigest()
-                if recomputed == a["sha256"]:
-                    st.success("Hash verified")
-                else:
-                    st.error("Hash mismatch")
+            if st.button("Verify hashes", key=f"v_verify_{r['id']}"):
+                for name, status in verify_artifacts(con, r["id"]):
+                    if status == "ok":
+                        st.success(f"{name}: hash verified")
+                    else:
+                        st.error(f"{name}: hash {status}")
 
     con.close()
 
-
+    prev_col, next_col = st.columns(2)
+    with prev_col:
+        if len(pages) > 1 and st.button("← Newer", key="v_prev"):
+            pages.pop()
+            st.rerun()
+    with next_col:
+        if next_key is not None and st.button("Older →", key="v_next"):
+            pages.append(next_key)
+            st.rerun()
@@ -1,4 +1,15 @@
-import streamlit as st
+import codecs
+import hashlib
+import io
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
 
 OCR_AVAILABLE = True
 
@@ -22,51 +33,382 @@ except Exception:
     OCR_DPI = 300
     OCR_LANGUAGE = "eng"
 
+try:
+    from config import OCR_WORKERS, OCR_BATCH_PAGES, OCR_MIN_PAGE_CHARS
+except Exception:
+    OCR_WORKERS = 0        # 0 = one per CPU
+    OCR_BATCH_PAGES = 4
+    OCR_MIN_PAGE_CHARS = 40
+
 if pytesseract and TESSERACT_CMD:
     pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
 
-def extract_text_from_pdf(uploaded_file):
+class ExtractionError(Exception):
+    """A document could not be read (unsupported type, corrupt file, ...)."""
+
+
+class NamedBytesIO(io.BytesIO):
+    """In-memory stand-in for a Streamlit UploadedFile (name, size, getvalue)."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def load_document(doc):
+    """Accepts a path or a (filename, bytes) pair and returns an upload-like object."""
+    if isinstance(doc, (str, Path)):
+        path = Path(doc)
+        return NamedBytesIO(path.name, path.read_bytes())
+    name, data = doc
+    return NamedBytesIO(name, data)
+
+
+# Document types iter_text_from_file can read.
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx", ".pptx")
+
+# Size of the decoded blocks yielded for plain-text uploads.
+TEXT_CHUNK_BYTES = 1 << 20
+
+
+def _joined(parts, sep="\n"):
+    """Yield parts with `sep` between them, like sep.join(parts) but lazily."""
+    first = True
+    for part in parts:
+        yield part if first else sep + part
+        first = False
+
+
+def iter_text_from_pdf(uploaded_file, warnings=None, ocr_workers=None):
+    """Yield the PDF text page by page; "".join() of the output is the full text.
+
+    Pages whose text layer has fewer than OCR_MIN_PAGE_CHARS characters
+    (scanned attachments, image-only pages) are OCR'd individually; all
+    other pages use their text layer. If OCR fails those pages keep their
+    text layer and the reason is appended to `warnings` (when given).
+
+    ocr_workers caps the OCR processes (default OCR_WORKERS, 0 = one per
+    CPU); callers already running in a pool worker pass 1 so OCR stays in
+    that process instead of multiplying pools.
+    """
     from PyPDF2 import PdfReader
     reader = PdfReader(uploaded_file)
-    text = "\n".join(pg.extract_text() or "" for pg in reader.pages)
 
-    if not text.strip() and OCR_AVAILABLE:
+    def plan():
+        for page_no, pg in enumerate(reader.pages, 1):
+            page_text = pg.extract_text() or ""
+            yield page_no, page_text, OCR_AVAILABLE and len(page_text.strip()) < OCR_MIN_PAGE_CHARS
+
+    pages = _iter_pages_with_ocr(uploaded_file.getvalue(), plan(), warnings, ocr_workers)
+    yield from _joined(pages)
+
+
+def _ocr_page_range(pdf_path, first_page, last_page):
+    """Render and OCR pages first_page..last_page (1-based, inclusive); runs in a worker.
+
+    Results are looked up in / stored to ocr_cache by the hash of the rendered
+    page image, so repeated scans of the same page skip tesseract.
+    """
+    from ocr_cache import get_cached_ocr, put_cached_ocr
+
+    images = pdf2image.convert_from_path(
+        pdf_path,
+        dpi=OCR_DPI,
+        first_page=first_page,
+        last_page=last_page,
+        poppler_path=POPPLER_PATH
+    )
+    texts = []
+    while images:
+        img = images.pop(0)
+        h = hashlib.sha256(f"{img.mode}:{img.size}:".encode() + img.tobytes()).hexdigest()
+        text = get_cached_ocr(h, OCR_LANGUAGE, OCR_DPI)
+        if text is None:
+            text = pytesseract.image_to_string(img, lang=OCR_LANGUAGE)
+            put_cached_ocr(h, OCR_LANGUAGE, OCR_DPI, text)
+        texts.append(text)
+        img.close()
+    return texts
+
+
+def _iter_pages_with_ocr(pdf_bytes, plan, warnings=None, ocr_workers=None):
+    """Yield one text per page, in page order.
+
+    `plan` yields (page_no, text_layer, needs_ocr). Consecutive pages that
+    need OCR are rendered and OCR'd OCR_BATCH_PAGES at a time on a process
+    pool. At most two batches per worker are in flight, so only a handful of
+    page images exist at once regardless of document length. If OCR fails,
+    the remaining pages fall back to their text layer.
+    """
+    workers = ocr_workers or OCR_WORKERS or os.cpu_count() or 1
+    batch = max(1, OCR_BATCH_PAGES)
+    max_inflight = 2 * workers
+    state = {"path": None, "pool": None, "inflight": 0, "failed": False}
+
+    # entries: (future, pages) for pending OCR, (None, texts) when ready
+    queue = deque()
+    run = []  # consecutive (page_no, text_layer) waiting to be submitted for OCR
+
+    def ocr_failed(e):
+        if not state["failed"] and warnings is not None:
+            warnings.append(f"OCR failed: {e}")
+        state["failed"] = True
+
+    def merge(ocr_texts, pages):
+        return [o if o.strip() else t for o, (_, t) in zip(ocr_texts, pages)]
+
+    def submit():
+        pages = list(run)
+        run.clear()
+        if state["failed"]:
+            queue.append((None, [t for _, t in pages]))
+            return
+        if state["path"] is None:
+            fd, state["path"] = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+        args = (state["path"], pages[0][0], pages[-1][0])
+        if workers == 1:
+            try:
+                queue.append((None, merge(_ocr_page_range(*args), pages)))
+            except Exception as e:
+                ocr_failed(e)
+                queue.append((None, [t for _, t in pages]))
+            return
+        if state["pool"] is None:
+            state["pool"] = ProcessPoolExecutor(max_workers=workers)
+        queue.append((state["pool"].submit(_ocr_page_range, *args), pages))
+        state["inflight"] += 1
+
+    def drain_one():
+        fut, pages = queue.popleft()
+        if fut is None:
+            return pages
+        state["inflight"] -= 1
         try:
-            images = pdf2image.convert_from_bytes(
-                uploaded_file.getvalue(),
-                dpi=OCR_DPI,
-                poppler_path=POPPLER_PATH
-            )
-            text = "\n".join(
-                pytesseract.image_to_string(img, lang=OCR_LANGUAGE)
-                for img in images
-            )
+            return merge(fut.result(), pages)
         except Exception as e:
-            st.error(f"OCR failed: {e}")
+            ocr_failed(e)
+            return [t for _, t in pages]
+
+    try:
+        for page_no, text_layer, needs_ocr in plan:
+            if run and (not needs_ocr or run[-1][0] != page_no - 1):
+                submit()
+            if needs_ocr:
+                run.append((page_no, text_layer))
+                if len(run) >= batch:
+                    submit()
+            else:
+                queue.append((None, [text_layer]))
+
+            # yield whatever is ready at the front; block on OCR only when too much is queued
+            while queue and (queue[0][0] is None or state["inflight"] >= max_inflight
+                             or len(queue) > max_inflight * batch):
+                yield from drain_one()
+
+        if run:
+            submit()
+        while queue:
+            yield from drain_one()
+    finally:
+        # also reached when the consumer stops early (triage)
+        if state["pool"] is not None:
+            state["pool"].shutdown(wait=True, cancel_futures=True)
+        if state["path"] is not None:
+            os.remove(state["path"])
+
 
-    return text
+def extract_text_from_pdf(uploaded_file, warnings=None):
+    return "".join(iter_text_from_pdf(uploaded_file, warnings))
 
 
-def extract_text_from_file(uploaded_file):
+def _iter_text_from_txt(uploaded_file):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    data = memoryview(uploaded_file.getvalue())
+    for i in range(0, len(data), TEXT_CHUNK_BYTES):
+        yield decoder.decode(data[i:i + TEXT_CHUNK_BYTES])
+    yield decoder.decode(b"", final=True)
+
+
+# -----------------------------
+# DOCX / PPTX: stream the XML parts straight from the zip
+# -----------------------------
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+# Characters per chunk yielded by the OOXML extractors.
+OOXML_CHUNK_CHARS = 1 << 16
+
+
+def _iter_xml_paragraphs(stream, para_tag, text_tag, breaks):
+    """Yield the text of every paragraph in one XML part, in document order.
+
+    Paragraphs nested inside another paragraph (text boxes) are yielded
+    when they close, ahead of their host paragraph. mc:Fallback blocks
+    duplicate their mc:Choice twin and are skipped. Every element is dropped
+    from the tree as soon as it closes, so memory stays flat.
+    """
+    stack = []   # text pieces of each open paragraph
+    elems = []   # open elements, to detach finished ones from their parent
+    fallback = 0
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            elems.append(elem)
+            if tag == _MC_FALLBACK:
+                fallback += 1
+            elif tag == para_tag and not fallback:
+                stack.append([])
+            continue
+
+        elems.pop()
+        if tag == _MC_FALLBACK:
+            fallback -= 1
+        elif fallback:
+            pass
+        elif tag == text_tag and stack:
+            stack[-1].append(elem.text or "")
+        elif tag in breaks and stack:
+            stack[-1].append(breaks[tag])
+        elif tag == para_tag and stack:
+            yield "".join(stack.pop())
+
+        if elems:
+            elems[-1].remove(elem)
+
+
+def _chunked(parts, sep="\n", limit=OOXML_CHUNK_CHARS):
+    """Like _joined(parts, sep) but batched into chunks of about `limit` chars."""
+    buf, size = [], 0
+    for piece in _joined(parts, sep):
+        buf.append(piece)
+        size += len(piece)
+        if size >= limit:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def _part_number(name):
+    m = re.search(r"(\d+)\.xml$", name)
+    return int(m.group(1)) if m else 0
+
+
+def _iter_docx_paragraphs(zf):
+    names = zf.namelist()
+    breaks = {_W + "tab": "\t", _W + "br": "\n", _W + "cr": "\n"}
+
+    # body (incl. tables and text boxes), then headers, footers and notes
+    parts = ["word/document.xml"]
+    for prefix in ("word/header", "word/footer"):
+        parts += sorted((n for n in names if n.startswith(prefix) and n.endswith(".xml")), key=_part_number)
+    parts += [n for n in ("word/footnotes.xml", "word/endnotes.xml", "word/comments.xml") if n in names]
+
+    for part in parts:
+        if part in names:
+            with zf.open(part) as f:
+                yield from _iter_xml_paragraphs(f, _W + "p", _W + "t", breaks)
+
+
+def _iter_text_from_docx(uploaded_file):
+    with zipfile.ZipFile(uploaded_file) as zf:
+        yield from _chunked(_iter_docx_paragraphs(zf))
+
+
+def _rels(zf, part):
+    """{relationship id: (type, resolved part name)} for one OOXML part."""
+    rels_name = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    out = {}
+    if rels_name not in zf.namelist():
+        return out
+    with zf.open(rels_name) as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _PKG_REL and elem.get("TargetMode") != "External":
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(part), elem.get("Target")))
+                out[elem.get("Id")] = (elem.get("Type", ""), target)
+    return out
+
+
+def _pptx_slides(zf):
+    """Slide part names in presentation order."""
+    pres = "ppt/presentation.xml"
+    rels = _rels(zf, pres)
+    slides = []
+    with zf.open(pres) as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _P + "sldId" and elem.get(_R + "id") in rels:
+                slides.append(rels[elem.get(_R + "id")][1])
+    return slides
+
+
+def _iter_pptx_paragraphs(zf):
+    breaks = {_A + "br": "\n"}
+    names = set(zf.namelist())
+    for slide in _pptx_slides(zf):
+        if slide not in names:
+            continue
+        with zf.open(slide) as f:
+            for text in _iter_xml_paragraphs(f, _A + "p", _A + "t", breaks):
+                if text.strip():
+                    yield text.strip()
+        for rel_type, target in _rels(zf, slide).values():
+            if rel_type.endswith("/notesSlide") and target in names:
+                with zf.open(target) as f:
+                    for text in _iter_xml_paragraphs(f, _A + "p", _A + "t", breaks):
+                        if text.strip():
+                            yield text.strip()
+
+
+def _iter_text_from_pptx(uploaded_file):
+    with zipfile.ZipFile(uploaded_file) as zf:
+        yield from _chunked(_iter_pptx_paragraphs(zf))
+
+
+def _guarded(chunks, name):
+    # surface parser failures (corrupt zip, broken PDF xref, bad XML) uniformly
+    try:
+        yield from chunks
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"{name}: {type(e).__name__}: {e}") from e
+
+
+def iter_text_from_file(uploaded_file, warnings=None, ocr_workers=None):
+    """Yield the document text in chunks (pages, paragraphs, blocks).
+
+    Feed the output to analysis_engine.analyze_stream so that large documents
+    never have to be held as a single string.
+
+    Raises ExtractionError for unsupported or unreadable documents (while
+    iterating, for the latter). Non-fatal problems such as a failed OCR pass
+    are appended to `warnings` when a list is passed. ocr_workers: see
+    iter_text_from_pdf.
+    """
     name = uploaded_file.name.lower()
+    uploaded_file.seek(0)
 
     if name.endswith(".pdf"):
-        return extract_text_from_pdf(uploaded_file)
-    if name.endswith(".txt"):
-        return uploaded_file.getvalue().decode("utf-8", errors="ignore")
-    if name.endswith(".docx"):
-        from docx import Document
-        doc = Document(uploaded_file)
-        return "\n".join(p.text for p in doc.paragraphs)
-    if name.endswith(".pptx"):
-        from pptx import Presentation
-        prs = Presentation(uploaded_file)
-        out = []
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text") and shape.text.strip():
-                    out.append(shape.text.strip())
-        return "\n".join(out)
-    return ""
+        chunks = iter_text_from_pdf(uploaded_file, warnings, ocr_workers)
+    elif name.endswith(".txt"):
+        chunks = _iter_text_from_txt(uploaded_file)
+    elif name.endswith(".docx"):
+        chunks = _iter_text_from_docx(uploaded_file)
+    elif name.endswith(".pptx"):
+        chunks = _iter_text_from_pptx(uploaded_file)
+    else:
+        raise ExtractionError(f"Unsupported file type: {uploaded_file.name}")
+    return _guarded(chunks, uploaded_file.name)
+
 
+def extract_text_from_file(uploaded_file, warnings=None):
+    return "".join(iter_text_from_file(uploaded_file, warnings))
@@ -1,10 +1,14 @@
 import csv
 import io
+import shutil
+import tempfile
 import zipfile
+import zlib
 from datetime import datetime
 
 import streamlit as st
 
+from blob_store import artifact_size, iter_artifact
 from db import get_connection
 
 
@@ -16,13 +20,13 @@ def _parse_iso(dt_str: str) -> datetime:
         return datetime.min
 
 
-def _fetch_inspections(con, where_sql: str, params: list):
+def _fetch_inspections(con, tenant_id, where_sql: str, params: list):
     return con.execute(f"""
         SELECT id, filename, sha256, ruleset, risk_level, risk_score, created_at
         FROM inspections
-        WHERE {where_sql}
+        WHERE tenant_id IS ? AND {where_sql}
         ORDER BY created_at DESC
-    """, params).fetchall()
+    """, [tenant_id] + params).fetchall()
 
 
 def _fetch_artifacts(con, inspection_ids: list[int]):
@@ -30,10 +34,11 @@ def _fetch_artifacts(con, inspection_ids: list[int]):
         return []
     placeholders = ",".join(["?"] * len(inspection_ids))
     return con.execute(f"""
-        SELECT id, inspection_id, name, sha256, content, created_at
-        FROM artifacts
-        WHERE inspection_id IN ({placeholders})
-        ORDER BY inspection_id DESC, name ASC
+        SELECT a.id, a.inspection_id, a.name, a.sha256, a.storage, a.codec, a.content, a.created_at,
+               b.size_bytes
+        FROM artifacts a LEFT JOIN blobs b ON b.sha256 = a.sha256
+        WHERE a.inspection_id IN ({placeholders})
+        ORDER BY a.inspection_id DESC, a.name ASC
     """, inspection_ids).fetchall()
 
 
@@ -84,7 +89,10 @@ def _build_manifest_csv(inspections, artifacts) -> bytes:
             ])
         else:
             for a in insp_arts:
-                bsize = len(a["content"]) if a["content"] is not None else 0
+                try:
+                    bsize = artifact_size(a)
+                except (zlib.error, ValueError):
+                    bsize = ""    # corrupted inline content; left out of the bundle too
                 writer.writerow([
                     insp_id,
                     insp["created_at"],
@@ -122,7 +130,9 @@ def _build_hashes_txt(inspections, artifacts) -> bytes:
     return txt.encode("utf-8")
 
 
-def _build_bundle_zip(manifest_csv: bytes, hashes_txt: bytes, artifacts, include_artifacts: bool) -> bytes:
+def _build_bundle_zip(manifest_csv: bytes, hashes_txt: bytes, artifacts, include_artifacts: bool):
+    """(zip bytes, [(artifact path, problem)]) -- unreadable artifacts are left out."""
+    failed = []
     buf = io.BytesIO()
     with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
         zf.writestr("manifest.csv", manifest_csv)
@@ -132,9 +142,23 @@ def _build_bundle_zip(manifest_csv: bytes, hashes_txt: bytes, artifacts, include
             for a in artifacts:
                 # Put artifacts under inspection folder for tidy packaging
                 arc_path = f"inspection_{a['inspection_id']}/{a['name']}"
-                zf.writestr(arc_path, a["content"] if a["content"] is not None else b"")
-
-    return buf.getvalue()
+                # streamed (and decompressed) from the blob file, never fully in memory;
+                # spooled first so a blob that fails to decode leaves no truncated entry
+                with tempfile.SpooledTemporaryFile(max_size=8 << 20) as tmp:
+                    try:
+                        for block in iter_artifact(a):
+                            tmp.write(block)
+                    except OSError:
+                        failed.append((arc_path, "missing"))
+                        continue
+                    except (zlib.error, ValueError):
+                        failed.append((arc_path, "corrupted"))
+                        continue
+                    tmp.seek(0)
+                    with zf.open(arc_path, "w") as out:
+                        shutil.copyfileobj(tmp, out)
+
+    return buf.getvalue(), failed
 
 
 def render_manifest_export():
@@ -146,6 +170,7 @@ def render_manifest_export():
     )
 
     con = get_connection()
+    tenant_id = st.session_state.get("active_tenant")
 
     # ---- Selection mode
     mode = st.radio(
@@ -163,9 +188,10 @@ def render_manifest_export():
         inspections = con.execute("""
             SELECT id, filename, sha256, ruleset, risk_level, risk_score, created_at
             FROM inspections
+            WHERE tenant_id IS ?
             ORDER BY created_at DESC
             LIMIT ?
-        """, (int(n),)).fetchall()
+        """, (tenant_id, int(n))).fetchall()
 
     elif mode == "Filter by date range":
         c1, c2 = st.columns(2)
@@ -181,7 +207,7 @@ def render_manifest_export():
 
         where_sql = "created_at >= ? AND created_at <= ?"
         params = [start_iso, end_iso]
-        inspections = _fetch_inspections(con, where_sql, params)
+        inspections = _fetch_inspections(con, tenant_id, where_sql, params)
 
     else:  # Pick specific IDs
         ids_str = st.text_input("Inspection IDs (comma-separated)", value="", key="m_ids")
@@ -197,12 +223,7 @@ def render_manifest_export():
             return
 
         placeholders = ",".join(["?"] * len(ids))
-        inspections = con.execute(f"""
-            SELECT id, filename, sha256, ruleset, risk_level, risk_score, created_at
-            FROM inspections
-            WHERE id IN ({placeholders})
-            ORDER BY created_at DESC
-        """, ids).fetchall()
+        inspections = _fetch_inspections(con, tenant_id, f"id IN ({placeholders})", ids)
 
     if not inspections:
         st.warning("No inspections found for this selection.")
@@ -233,9 +254,11 @@ def render_manifest_export():
             lines = [ln for ln in lines if not ln.endswith(tuple([f"source/{r['filename']}" for r in inspections]))]
             hashes_txt = ("\n".join(lines) + "\n").encode("utf-8")
 
-        bundle_zip = _build_bundle_zip(manifest_csv, hashes_txt, artifacts, include_artifacts)
+        bundle_zip, failed = _build_bundle_zip(manifest_csv, hashes_txt, artifacts, include_artifacts)
 
         st.success("Manifest package generated.")
+        for path, problem in failed:
+            st.error(f"{path}: stored content is {problem}; left out of the bundle")
 
         # Downloads (KEY-SAFE)
         st.download_button(
@@ -0,0 +1,312 @@
+import hashlib
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from rulesets import RULESETS
+
+try:
+    from re import _parser as _sre_parse, _constants as _sre_const
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+    import sre_constants as _sre_const
+
+# Optional: the third-party `regex` engine can abort a single runaway match
+# (timeout=...). Without it, budgets are enforced between blocks of matches:
+# a backtracking pattern runs until its current search finishes, and the
+# caller flags it afterwards for having overrun its budget.
+try:
+    import regex as _regex_engine
+except Exception:
+    _regex_engine = None
+
+HARD_REGEX_TIMEOUTS = _regex_engine is not None
+
+# -----------------------------
+# Compiled ruleset matcher
+# -----------------------------
+#
+# Every phrase list of a ruleset (explicit markings, context phrases,
+# keywords) is folded into a single trie, and every regex is compiled once.
+# A document is then scanned once for all phrases instead of once per phrase.
+
+Span = Tuple[int, int]
+
+_END = ""  # trie key marking the end of a phrase
+
+
+def lint_regex(src: str) -> List[str]:
+    """Static check for patterns prone to catastrophic backtracking."""
+    try:
+        tree = _sre_parse.parse(src, re.IGNORECASE)
+    except re.error as e:
+        return [f"does not compile: {e}"]
+
+    issues: List[str] = []
+    repeats = (_sre_const.MAX_REPEAT, _sre_const.MIN_REPEAT)
+
+    def walk(items, in_repeat):
+        for op, av in items:
+            if op in repeats:
+                lo, hi, sub = av
+                unbounded = hi == _sre_const.MAXREPEAT
+                if in_repeat and unbounded:
+                    issues.append("nested quantifier: unbounded repeat inside a repeated group")
+                walk(sub, in_repeat or unbounded or hi > 1)
+            elif op == _sre_const.SUBPATTERN:
+                walk(av[-1], in_repeat)
+            elif op == _sre_const.BRANCH:
+                for branch in av[1]:
+                    walk(branch, in_repeat)
+            elif op in (_sre_const.ASSERT, _sre_const.ASSERT_NOT):
+                walk(av[1], in_repeat)
+
+    walk(tree, False)
+    return sorted(set(issues))
+
+
+def _compile_pattern(src: str):
+    if _regex_engine is not None:
+        return _regex_engine.compile(src, _regex_engine.IGNORECASE)
+    return re.compile(src, re.IGNORECASE)
+
+
+def ruleset_fingerprint(rs: Dict) -> str:
+    """Stable content hash of a ruleset definition."""
+    blob = json.dumps(rs, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+@lru_cache(maxsize=512)
+def _candidates(phrases: Tuple[str, ...], overlapping: bool = True) -> re.Pattern:
+    """Alternation matching wherever any of `phrases` starts.
+
+    The overlapping form is zero-width so finditer visits every start
+    position; the plain form lets search() use sre's first-character skip.
+    """
+    alts = "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+    return re.compile(f"(?=(?:{alts}))" if overlapping else f"(?:{alts})")
+
+
+class PhraseMatcher:
+    """Aho-Corasick style multi-phrase matcher over lowercase text.
+
+    Phrases live in one trie. Candidate start positions come from a single
+    compiled lookahead alternation (so skipping non-candidate text happens
+    in C), and the trie is walked from each candidate to report every phrase
+    starting there, including overlapping ones ("cui" and "cui//"). A pure
+    Python failure-link walk would touch every character and be slower than
+    the per-phrase `in` scans this replaces.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: Tuple[str, ...] = tuple(dict.fromkeys(p for p in phrases if p))
+        self.max_len = max((len(p) for p in self.phrases), default=0)
+
+        self._trie: Dict = {}
+        for p in self.phrases:
+            node = self._trie
+            for ch in p:
+                node = node.setdefault(ch, {})
+            node[_END] = p
+
+    def _walk(self, tlow: str, pos: int) -> Iterator[str]:
+        node = self._trie
+        n = len(tlow)
+        i = pos
+        while i < n:
+            node = node.get(tlow[i])
+            if node is None:
+                return
+            i += 1
+            if _END in node:
+                yield node[_END]
+
+    def iter_matches(self, tlow: str, start: int = 0, stop: int | None = None) -> Iterator[Tuple[int, str]]:
+        """Yield (position, phrase) for every phrase starting in [start, stop)."""
+        if not self.phrases:
+            return
+        stop = len(tlow) if stop is None else stop
+        for m in _candidates(self.phrases).finditer(tlow, start):
+            pos = m.start()
+            if pos >= stop:
+                break
+            for phrase in self._walk(tlow, pos):
+                yield pos, phrase
+
+    def first_positions(self, tlow: str, start: int = 0, stop: int | None = None,
+                        skip: Iterable[str] = ()) -> Dict[str, int]:
+        """Position of the first occurrence of each phrase starting in [start, stop).
+
+        Phrases already found drop out of the candidate set, so dense text
+        costs one C-level search per distinct phrase rather than one Python
+        step per occurrence. Phrases in `skip` are not searched for.
+        """
+        stop = len(tlow) if stop is None else stop
+        skip = set(skip)
+        remaining = [p for p in self.phrases if p not in skip]
+        found: Dict[str, int] = {}
+        pos = start
+        while remaining:
+            m = _candidates(tuple(remaining), False).search(tlow, pos)
+            if m is None or m.start() >= stop:
+                break
+            pos = m.start()
+            for phrase in self._walk(tlow, pos):
+                if phrase not in found and phrase not in skip:
+                    found[phrase] = pos
+            remaining = [p for p in remaining if p not in found]
+            pos += 1
+        return found
+
+
+# Matches drained between two budget checks.
+_DRAIN_BLOCK = 4096
+
+
+@dataclass
+class ScanResult:
+    phrase_spans: Dict[str, List[Span]] = field(default_factory=dict)   # phrase -> spans (lowercase text)
+    pattern_spans: Dict[str, List[Span]] = field(default_factory=dict)  # regex source -> spans
+
+
+class CompiledRuleset:
+    """All phrases and regexes of one or more rulesets, compiled once per ruleset version.
+
+    Several rulesets compile into one merged matcher: shared phrases sit in
+    the trie once and identical regexes (e.g. SSN) run once.
+    """
+
+    def __init__(self, *rulesets: Dict, fingerprint: str | None = None):
+        self.fingerprint = fingerprint or _combined_fingerprint(rulesets)
+        self.phrases = PhraseMatcher(
+            p
+            for rs in rulesets
+            for key in ("explicit_markings", "context_phrases", "keywords")
+            for p in rs.get(key, [])
+        )
+        # keyed by regex source so identical regexes are only run once
+        self.patterns: Dict[str, re.Pattern] = {}
+        self.warnings: Dict[str, List[str]] = {}  # regex -> lint_regex issues
+        for rs in rulesets:
+            for pdef in rs.get("patterns", {}).values():
+                src = pdef["regex"]
+                if src not in self.patterns:
+                    self.patterns[src] = _compile_pattern(src)
+                    issues = lint_regex(src)
+                    if issues:
+                        self.warnings[src] = issues
+
+    def iter_pattern_matches(self, regex: str, text: str, start: int = 0,
+                             stop: int | None = None) -> Iterator[Span]:
+        """Yield spans of `regex` whose match starts in [start, stop)."""
+        stop = len(text) if stop is None else stop
+        for m in self.patterns[regex].finditer(text, start):
+            if m.start() >= stop:
+                break
+            yield m.start(), m.end()
+
+    def count_pattern_matches(self, regex: str, text: str, start: int = 0, stop: int | None = None,
+                              keep: int = 0, deadline: float | None = None
+                              ) -> Tuple[int, List[Span], int | None, bool]:
+        """(count, first `keep` spans, end of last match, truncated) for matches starting in [start, stop).
+
+        Only the kept matches become Python tuples; the remainder is counted
+        by draining finditer through a bounded deque without per-match
+        Python code or excerpt strings.
+
+        `deadline` is a time.perf_counter() value. Past it the scan stops and
+        returns what was counted so far with truncated=True. With the `regex`
+        engine installed even a single runaway match is interrupted;
+        otherwise the deadline is only checked every _DRAIN_BLOCK matches,
+        so a pattern that backtracks without matching can run well past it
+        (callers compare the time actually spent against their budget).
+        """
+        count = 0
+        spans: List[Span] = []
+        last_end = None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return count, spans, last_end, True
+
+        if deadline is not None and _regex_engine is not None:
+            it = self.patterns[regex].finditer(text, start, timeout=max(deadline - time.perf_counter(), 0.001))
+        else:
+            it = self.patterns[regex].finditer(text, start)
+
+        # Only matches in the last len(text) - stop characters can be past
+        # `stop`, so a deque this long always retains the last accepted match.
+        maxlen = 1 if stop is None else len(text) - stop + 2
+        try:
+            if keep:
+                for m in it:
+                    if stop is not None and m.start() >= stop:
+                        return count, spans, last_end, False
+                    count += 1
+                    last_end = m.end()
+                    spans.append((m.start(), last_end))
+                    if count >= keep:
+                        break
+
+            while True:
+                tail = deque(enumerate(islice(it, _DRAIN_BLOCK), count + 1), maxlen=maxlen)
+                if not tail:
+                    return count, spans, last_end, False
+                past_stop = False
+                if stop is not None:
+                    while tail and tail[-1][1].start() >= stop:
+                        tail.pop()
+                        past_stop = True
+                if tail:
+                    count, m = tail[-1]
+                    last_end = m.end()
+                if past_stop:
+                    return count, spans, last_end, False
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return count, spans, last_end, True
+        except TimeoutError:
+            return count, spans, last_end, True
+
+    def scan(self, text: str, tlow: str | None = None, all_phrase_spans: bool = False) -> ScanResult:
+        """Single pass over the text for all phrases, plus one pass per distinct regex.
+
+        By default only the first span of each phrase is kept (that is all the
+        scoring model needs); pass all_phrase_spans=True for every occurrence.
+        """
+        tlow = text.lower() if tlow is None else tlow
+        res = ScanResult()
+        if all_phrase_spans:
+            for pos, phrase in self.phrases.iter_matches(tlow):
+                res.phrase_spans.setdefault(phrase, []).append((pos, pos + len(phrase)))
+        else:
+            for phrase, pos in self.phrases.first_positions(tlow).items():
+                res.phrase_spans[phrase] = [(pos, pos + len(phrase))]
+        for regex in self.patterns:
+            spans = list(self.iter_pattern_matches(regex, text))
+            if spans:
+                res.pattern_spans[regex] = spans
+        return res
+
+
+def _combined_fingerprint(rulesets) -> str:
+    if len(rulesets) == 1:
+        return ruleset_fingerprint(rulesets[0])
+    return hashlib.sha256("".join(ruleset_fingerprint(rs) for rs in rulesets).encode()).hexdigest()
+
+
+_COMPILED: Dict[Tuple[str, ...], CompiledRuleset] = {}
+
+
+def get_compiled(*ruleset_names: str) -> CompiledRuleset:
+    """Compiled (merged) form of the named RULESETS; rebuilt only when one of them changes."""
+    rulesets = [RULESETS[n] for n in ruleset_names]
+    fp = _combined_fingerprint(rulesets)
+    compiled = _COMPILED.get(ruleset_names)
+    if compiled is None or compiled.fingerprint != fp:
+        compiled = CompiledRuleset(*rulesets, fingerprint=fp)
+        _COMPILED[ruleset_names] = compiled
+    return compiled
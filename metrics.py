@@ -0,0 +1,52 @@
+import threading
+from collections import deque
+from typing import Dict
+
+# -----------------------------
+# Rolling in-process metrics
+# -----------------------------
+#
+# analysis_engine records one sample per rule / phase for every profiled
+# analysis. Only the most recent `window` samples per metric are kept.
+
+
+class MetricsRegistry:
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, matches: int = 0, chars: int = 0):
+        with self._lock:
+            series = self._samples.get(name)
+            if series is None:
+                series = self._samples[name] = deque(maxlen=self.window)
+            series.append((seconds, matches, chars))
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-metric summary over the current window, slowest (p95) first."""
+        with self._lock:
+            samples = {k: list(v) for k, v in self._samples.items()}
+
+        out = {}
+        for name, rows in samples.items():
+            times = sorted(r[0] for r in rows)
+            total_s = sum(times)
+            chars = sum(r[2] for r in rows)
+            out[name] = {
+                "samples": len(rows),
+                "mean_ms": round(1000 * total_s / len(rows), 3),
+                "p95_ms": round(1000 * times[min(len(times) - 1, int(0.95 * len(times)))], 3),
+                "max_ms": round(1000 * times[-1], 3),
+                "matches": sum(r[1] for r in rows),
+                "chars_scanned": chars,
+                "mchars_per_s": round(chars / total_s / 1e6, 2) if total_s else None,
+            }
+        return dict(sorted(out.items(), key=lambda kv: kv[1]["p95_ms"], reverse=True))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+REGISTRY = MetricsRegistry()
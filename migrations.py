@@ -0,0 +1,278 @@
+"""Versioned schema migrations for the inspection tables.
+
+db.init_db() calls migrate() on every start; each migration runs once, in
+order, inside its own transaction, and is recorded in schema_version.
+
+    python migrations.py                 # apply pending migrations
+    python migrations.py --check-plans   # EXPLAIN the hot queries, exit 1 on a full scan
+    python migrations.py --assign-tenant 3   # give inspections with no tenant to tenant 3
+
+Inspections stored before tenant scoping have no tenant_id and do not show
+up on any page. Migration 6 assigns them automatically when the database
+has exactly one tenant; with several tenants, use --assign-tenant.
+"""
+import argparse
+import sys
+
+from utils import now_iso
+
+
+def _columns(con, table):
+    return {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+
+
+def _m1_inspection_tables(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS inspections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id INTEGER,
+            filename TEXT,
+            sha256 TEXT,
+            ruleset TEXT,
+            risk_level TEXT,
+            risk_score INTEGER,
+            analysis_json TEXT,
+            created_at TEXT
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS artifacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inspection_id INTEGER,
+            name TEXT,
+            sha256 TEXT,
+            content BLOB,
+            created_at TEXT
+        )
+    """)
+    # databases created before tenant scoping
+    if "tenant_id" not in _columns(con, "inspections"):
+        con.execute("ALTER TABLE inspections ADD COLUMN tenant_id INTEGER")
+
+
+def _m2_tenant_indexes(con):
+    for sql in (
+        # list pages: newest first within a tenant (vault, compare, manifest, search)
+        "CREATE INDEX IF NOT EXISTS idx_inspections_tenant_created ON inspections (tenant_id, created_at, id)",
+        # search by file hash prefix (GLOB 'abc*')
+        "CREATE INDEX IF NOT EXISTS idx_inspections_tenant_sha ON inspections (tenant_id, sha256)",
+        # search by ruleset / risk level, newest first
+        "CREATE INDEX IF NOT EXISTS idx_inspections_tenant_ruleset_risk "
+        "ON inspections (tenant_id, ruleset, risk_level, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_inspections_tenant_risk ON inspections (tenant_id, risk_level, created_at)",
+        # lookups by ruleset alone (maintenance queries)
+        "CREATE INDEX IF NOT EXISTS idx_inspections_ruleset ON inspections (ruleset)",
+        "CREATE INDEX IF NOT EXISTS idx_artifacts_inspection ON artifacts (inspection_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_inspection_members_member ON inspection_members (member_inspection_id)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_tenant_ts ON audit_log (tenant_id, timestamp)",
+    ):
+        con.execute(sql)
+
+
+def _m3_blob_store(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size_bytes INTEGER,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT
+        )
+    """)
+    # 'db': bytes inline in artifacts.content (rows written before the blob store);
+    # 'blob': bytes in blob_store under artifacts.sha256, content is NULL
+    if "storage" not in _columns(con, "artifacts"):
+        con.execute("ALTER TABLE artifacts ADD COLUMN storage TEXT NOT NULL DEFAULT 'db'")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs (refcount) WHERE refcount <= 0")
+
+
+def _m4_scrubber(con):
+    cols = _columns(con, "artifacts")
+    if "last_verified_at" not in cols:
+        con.execute("ALTER TABLE artifacts ADD COLUMN last_verified_at TEXT")
+    if "last_verified_status" not in cols:
+        con.execute("ALTER TABLE artifacts ADD COLUMN last_verified_status TEXT")
+    # scrubber picks never-verified, then least recently verified artifacts
+    con.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_last_verified ON artifacts (last_verified_at, id)")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS merkle_roots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id INTEGER,
+            root TEXT,
+            artifact_count INTEGER,
+            status_json TEXT,
+            computed_at TEXT
+        )
+    """)
+    con.execute("CREATE INDEX IF NOT EXISTS idx_merkle_roots_tenant ON merkle_roots (tenant_id, computed_at)")
+
+
+def _m5_storage_codecs(con):
+    # storage_codec names; rows written before compression are 'identity'
+    for table, column in (("inspections", "analysis_codec"), ("artifacts", "codec"), ("blobs", "codec")):
+        if column not in _columns(con, table):
+            con.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT NOT NULL DEFAULT 'identity'")
+    if "stored_bytes" not in _columns(con, "blobs"):
+        con.execute("ALTER TABLE blobs ADD COLUMN stored_bytes INTEGER")
+
+
+def assign_tenant(con, tenant_id):
+    """Give every inspection without a tenant (written before tenant scoping) to tenant_id.
+
+    Pages only list the active tenant's rows, so unassigned inspections are
+    invisible in the UI until this runs. Returns the number of rows changed.
+    """
+    return con.execute("UPDATE inspections SET tenant_id=? WHERE tenant_id IS NULL", (tenant_id,)).rowcount
+
+
+def _m6_backfill_tenant(con):
+    # unambiguous only with a single tenant; otherwise run --assign-tenant
+    tenants = con.execute("SELECT id FROM tenants").fetchall()
+    if len(tenants) == 1:
+        assign_tenant(con, tenants[0][0])
+
+
+MIGRATIONS = [
+    (1, "inspections / artifacts tables with tenant_id", _m1_inspection_tables),
+    (2, "tenant-led indexes for list, search and artifact lookups", _m2_tenant_indexes),
+    (3, "blobs table and artifacts.storage for the on-disk artifact store", _m3_blob_store),
+    (4, "artifact verification columns and per-tenant Merkle roots", _m4_scrubber),
+    (5, "codec columns for compressed analysis_json and artifact content", _m5_storage_codecs),
+    (6, "assign pre-tenant inspections to the only tenant", _m6_backfill_tenant),
+]
+
+
+def current_version(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    """)
+    return con.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def migrate(con):
+    """Apply pending migrations; returns the list of versions applied."""
+    applied = []
+    have = current_version(con)
+    con.commit()
+    for version, description, fn in MIGRATIONS:
+        if version <= have:
+            continue
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            # another process may have migrated while we waited for the lock
+            if con.execute("SELECT 1 FROM schema_version WHERE version=?", (version,)).fetchone():
+                con.commit()
+                continue
+            fn(con)
+            con.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                        (version, description, now_iso()))
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# -----------------------------
+# Query plan checks
+# -----------------------------
+#
+# The queries behind the list / search / compare / export pages. Each must
+# be answered through an index; list queries must also come back in index
+# order (no temp B-tree sort), so LIMIT stops early at millions of rows.
+
+QUERY_PLAN_CHECKS = [
+    ("vault / compare list", """
+        SELECT id, filename, risk_level, risk_score, created_at FROM inspections
+        WHERE tenant_id IS ? ORDER BY created_at DESC LIMIT 200
+    """, (1,), False),
+    ("vault page after a key", """
+        SELECT id, filename, risk_level, risk_score, created_at FROM inspections
+        WHERE tenant_id IS ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 51
+    """, (1, "2026-01-01T00:00:00Z", 100), False),
+    ("search by sha256 prefix", """
+        SELECT id, filename, ruleset, risk_level, risk_score, created_at FROM inspections
+        WHERE tenant_id IS ? AND sha256 GLOB ? AND risk_score BETWEEN ? AND ?
+        ORDER BY created_at DESC LIMIT 300
+    """, (1, "ab12*", 0, 100), True),
+    ("search by ruleset and risk", """
+        SELECT id, filename, ruleset, risk_level, risk_score, created_at FROM inspections
+        WHERE tenant_id IS ? AND ruleset=? AND risk_level=? AND risk_score BETWEEN ? AND ?
+        ORDER BY created_at DESC LIMIT 300
+    """, (1, "Basic", "HIGH", 0, 100), False),
+    ("search by risk", """
+        SELECT id, filename, ruleset, risk_level, risk_score, created_at FROM inspections
+        WHERE tenant_id IS ? AND risk_level=? AND risk_score BETWEEN ? AND ?
+        ORDER BY created_at DESC LIMIT 300
+    """, (1, "HIGH", 0, 100), False),
+    ("manifest date range", """
+        SELECT id, filename, sha256, ruleset, risk_level, risk_score, created_at FROM inspections
+        WHERE tenant_id IS ? AND created_at >= ? AND created_at <= ? ORDER BY created_at DESC
+    """, (1, "2026-01-01T00:00:00", "2026-01-31T23:59:59"), False),
+    ("artifacts of an inspection", """
+        SELECT name, sha256, storage, codec, content FROM artifacts WHERE inspection_id=?
+    """, (1,), False),
+    ("scrubber batch", """
+        SELECT id, sha256, storage, codec, content FROM artifacts
+        WHERE last_verified_at IS NULL OR last_verified_at < ?
+        ORDER BY last_verified_at, id LIMIT 200
+    """, ("2026-01-01T00:00:00Z",), True),
+    ("tenant Merkle root", """
+        SELECT a.id, a.inspection_id, a.name, a.sha256
+        FROM artifacts a JOIN inspections i ON i.id = a.inspection_id
+        WHERE i.tenant_id IS ? ORDER BY a.id
+    """, (1,), True),
+    ("rescore history", """
+        SELECT id, risk_level, analysis_json, analysis_codec FROM inspections WHERE tenant_id IS ? AND ruleset=?
+    """, (1, "Basic"), False),
+]
+
+
+def check_query_plans(con):
+    """Return [(check name, plan)] for every hot query with a bad plan."""
+    problems = []
+    for name, sql, params, allow_sort in QUERY_PLAN_CHECKS:
+        plan = [r[-1] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        full_scan = any(
+            step.startswith("SCAN") and "USING" not in step and "CONSTANT" not in step
+            for step in plan
+        )
+        sorted_in_memory = any("USE TEMP B-TREE FOR ORDER BY" in step for step in plan)
+        if full_scan or (sorted_in_memory and not allow_sort):
+            problems.append((name, plan))
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply schema migrations / check query plans.")
+    ap.add_argument("--check-plans", action="store_true", help="exit 1 if a hot query needs a full scan")
+    ap.add_argument("--assign-tenant", type=int, metavar="TENANT_ID",
+                    help="assign inspections that have no tenant to this tenant")
+    args = ap.parse_args(argv)
+
+    from db import get_db, init_db
+    init_db()
+    con = get_db()
+    print(f"schema version {current_version(con)}")
+    if args.assign_tenant is not None:
+        if not con.execute("SELECT 1 FROM tenants WHERE id=?", (args.assign_tenant,)).fetchone():
+            con.close()
+            ap.error(f"no tenant with id {args.assign_tenant}")
+        n = assign_tenant(con, args.assign_tenant)
+        con.commit()
+        print(f"assigned {n} inspections to tenant {args.assign_tenant}")
+    if args.check_plans:
+        problems = check_query_plans(con)
+        for name, plan in problems:
+            print(f"BAD PLAN {name}: {' / '.join(plan)}", file=sys.stderr)
+        con.close()
+        sys.exit(1 if problems else 0)
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
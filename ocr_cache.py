@@ -0,0 +1,63 @@
+import sqlite3
+
+from db import get_db
+from utils import now_iso
+
+try:
+    from config import OCR_CACHE_MAX_ENTRIES
+except Exception:
+    OCR_CACHE_MAX_ENTRIES = 50000
+
+# -----------------------------
+# Per-page OCR cache
+# -----------------------------
+#
+# Keyed by the sha256 of the rendered page image plus OCR language and DPI,
+# so an identical scanned page is OCR'd once no matter which document (or
+# tenant) it arrives in. Only OCR text is stored, never the image.
+#
+# The cache is best effort: a missing table or a locked database is treated
+# as a miss so OCR itself never fails because of it.
+
+
+def get_cached_ocr(image_sha256, lang, dpi):
+    try:
+        con = get_db()
+        try:
+            row = con.execute("""
+                SELECT text FROM ocr_cache WHERE image_sha256=? AND lang=? AND dpi=?
+            """, (image_sha256, lang, dpi)).fetchone()
+            if row is not None:
+                con.execute("""
+                    UPDATE ocr_cache SET last_used_at=? WHERE image_sha256=? AND lang=? AND dpi=?
+                """, (now_iso(), image_sha256, lang, dpi))
+                con.commit()
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return None
+    return None if row is None else row["text"]
+
+
+def put_cached_ocr(image_sha256, lang, dpi, text, max_entries=OCR_CACHE_MAX_ENTRIES):
+    ts = now_iso()
+    try:
+        con = get_db()
+        try:
+            con.execute("""
+                INSERT OR REPLACE INTO ocr_cache
+                (image_sha256, lang, dpi, text, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (image_sha256, lang, dpi, text, ts, ts))
+            # least recently used entries beyond the budget
+            con.execute("""
+                DELETE FROM ocr_cache WHERE rowid IN (
+                    SELECT rowid FROM ocr_cache ORDER BY last_used_at DESC, rowid DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (max_entries,))
+            con.commit()
+        finally:
+            con.close()
+    except sqlite3.Error:
+        pass
@@ -0,0 +1,195 @@
+"""Re-score stored inspections under candidate ruleset weights.
+
+Loads the scoring inputs of a tenant's stored inspections for a ruleset
+into one NumPy matrix and applies any number of candidate weight vectors in
+a single matrix product. Nothing is re-extracted or re-scanned.
+
+    python rescore.py --tenant-id 3 --ruleset "DoD / GovCon" --candidate '{"pattern": 12}' \
+        --candidate '{"context": 10, "missing_markings_bonus": 20}'
+
+Rows whose stored counts are incomplete (score-only, triage-stopped or
+regex-budget-truncated scans, or extraction problems such as failed OCR)
+are skipped. Rows stored before
+signal_counts existed have their counts rebuilt from the capped hit list;
+those counts are lower bounds, are reported as "approximated_rows", and
+can be left out with --exact-only.
+"""
+import argparse
+import json
+import zlib
+from typing import Any, Dict, List
+
+import numpy as np
+
+from db import get_db
+from rulesets import RULESETS
+from storage_codec import load_json
+
+LEVELS = ["LOW", "MEDIUM", "HIGH"]
+
+# Column order of the feature matrix; each maps onto one weight.
+WEIGHT_KEYS = [
+    "explicit_marking",
+    "context",
+    "pattern",
+    "missing_markings_bonus",
+    "keyword",
+    "multi_category_bonus",
+]
+
+
+def _features(analysis: Dict[str, Any]) -> List[float]:
+    """Scoring-model inputs of one stored analysis (see analysis_engine._finalize)."""
+    counts = analysis.get("signal_counts")
+    if counts is None:
+        # rows stored before signal_counts existed: rebuild from hits, which are
+        # capped per kind, so explicit/context counts can be understated
+        hits = analysis.get("hits", [])
+        counts = {
+            "explicit_markings": sum(1 for h in hits if h.get("name") == "explicit_marking"),
+            "context_phrases": sum(1 for h in hits if h.get("name") == "handling_context"),
+            "patterns": sum(int(v) for v in (analysis.get("patterns_found") or {}).values()),
+            "keywords": len(analysis.get("keyword_triggers_hit") or []),
+            "categories": len(analysis.get("cui_categories") or []),
+        }
+    return [
+        counts["explicit_markings"],
+        min(counts["context_phrases"], 12),
+        counts["patterns"],
+        1.0 if analysis.get("missing_markings_heuristic") else 0.0,
+        counts["keywords"],
+        1.0 if counts["categories"] >= 2 else 0.0,
+    ]
+
+
+def _incomplete(analysis: Dict[str, Any]) -> str | None:
+    """Why a stored analysis cannot be re-scored, or None."""
+    if "archive_members" in analysis:
+        # archive roll-ups; their members are stored (and re-scored) individually
+        return "archive"
+    if analysis.get("score_only"):
+        return "score_only"
+    if analysis.get("partial_scan"):
+        return "partial_scan"
+    if analysis.get("truncated_patterns"):
+        return "truncated_patterns"
+    if analysis.get("extraction_warnings"):
+        return "extraction_warnings"
+    return None
+
+
+def load_history(ruleset_name: str, tenant_id, con=None, exact_only: bool = False):
+    """One tenant's stored inspections for a ruleset, ready to re-score.
+
+    Returns (inspection ids, feature matrix, stored risk level indexes,
+    approximate-row mask, {reason: skipped row count}).
+    """
+    own = con is None
+    con = con or get_db()
+    ids, rows, stored, approx = [], [], [], []
+    skipped: Dict[str, int] = {}
+    cur = con.execute(
+        "SELECT id, risk_level, analysis_json, analysis_codec FROM inspections WHERE tenant_id IS ? AND ruleset=?",
+        (tenant_id, ruleset_name),
+    )
+    for r in cur:
+        try:
+            analysis = load_json(r["analysis_json"], r["analysis_codec"])
+        except (TypeError, ValueError, zlib.error):
+            reason = "unreadable"
+        else:
+            reason = _incomplete(analysis)
+            if reason is None and exact_only and "signal_counts" not in analysis:
+                reason = "approximate"
+        if reason:
+            skipped[reason] = skipped.get(reason, 0) + 1
+            continue
+        ids.append(r["id"])
+        rows.append(_features(analysis))
+        stored.append(LEVELS.index(r["risk_level"]) if r["risk_level"] in LEVELS else -1)
+        approx.append("signal_counts" not in analysis)
+    if own:
+        con.close()
+
+    X = np.asarray(rows, dtype=np.float64).reshape(len(rows), len(WEIGHT_KEYS))
+    return (np.asarray(ids, dtype=np.int64), X, np.asarray(stored, dtype=np.int64),
+            np.asarray(approx, dtype=bool), skipped)
+
+
+def weight_matrix(ruleset_name: str, candidates: List[Dict[str, float]]) -> np.ndarray:
+    """Column 0 is the current weights; column i is current weights overridden by candidates[i-1]."""
+    base = RULESETS[ruleset_name]["weights"]
+    cols = [base] + [{**base, **c} for c in candidates]
+    return np.array([[float(w[k]) for w in cols] for k in WEIGHT_KEYS], dtype=np.float64)
+
+
+def score_levels(X: np.ndarray, W: np.ndarray):
+    """Risk scores and level indexes (0=LOW, 1=MEDIUM, 2=HIGH) for every row x weight column."""
+    scores = np.trunc(np.clip(X @ W, 0, 100)).astype(np.int64)
+    levels = (scores >= 30).astype(np.int64) + (scores >= 70)
+    return scores, levels
+
+
+def rescore_history(ruleset_name: str, candidates: List[Dict[str, float]], tenant_id=None, con=None,
+                    exact_only: bool = False) -> Dict[str, Any]:
+    ids, X, stored, approx, skipped = load_history(ruleset_name, tenant_id, con, exact_only)
+    W = weight_matrix(ruleset_name, candidates)
+    scores, levels = score_levels(X, W)
+
+    def dist(col):
+        return {lvl: int(n) for lvl, n in zip(LEVELS, np.bincount(col, minlength=3))}
+
+    current = levels[:, 0]
+    report = {
+        "ruleset": ruleset_name,
+        "tenant_id": tenant_id,
+        "inspections": int(len(ids)),
+        "approximated_rows": int(approx.sum()),
+        "skipped_rows": skipped,
+        "stored_levels": {lvl: int((stored == i).sum()) for i, lvl in enumerate(LEVELS)},
+        "current_weights": dist(current),
+        "candidates": [],
+    }
+    for j, cand in enumerate(candidates, start=1):
+        col = levels[:, j]
+        # transitions[a][b] = rows moving from level a (current weights) to level b
+        transitions = np.zeros((3, 3), dtype=np.int64)
+        np.add.at(transitions, (current, col), 1)
+        report["candidates"].append({
+            "weights": {**RULESETS[ruleset_name]["weights"], **cand},
+            "levels": dist(col),
+            "changed": int((col != current).sum()),
+            "mean_score_delta": float((scores[:, j] - scores[:, 0]).mean()) if len(ids) else 0.0,
+            "transitions": {
+                LEVELS[a]: {LEVELS[b]: int(transitions[a, b]) for b in range(3)}
+                for a in range(3)
+            },
+        })
+    return report
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-score stored inspections under candidate weights.")
+    ap.add_argument("--ruleset", required=True, choices=list(RULESETS))
+    ap.add_argument("--tenant-id", type=int, required=True, help="tenant whose inspections are re-scored")
+    ap.add_argument("--exact-only", action="store_true",
+                    help="leave out old rows whose counts are rebuilt from capped hits")
+    ap.add_argument("--candidate", action="append", default=[],
+                    help="JSON object of weight overrides, e.g. '{\"pattern\": 12}' (repeatable)")
+    ap.add_argument("--candidates-file", help="JSON file holding a list of weight override objects")
+    args = ap.parse_args(argv)
+
+    candidates = [json.loads(c) for c in args.candidate]
+    if args.candidates_file:
+        with open(args.candidates_file, encoding="utf-8") as f:
+            candidates.extend(json.load(f))
+    unknown = {k for c in candidates for k in c} - set(WEIGHT_KEYS)
+    if unknown:
+        ap.error(f"unknown weight keys: {', '.join(sorted(unknown))}")
+
+    print(json.dumps(rescore_history(args.ruleset, candidates, args.tenant_id, exact_only=args.exact_only),
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Headless bulk scanner: walk directories and analyze every supported file.
+
+    python scan_cli.py /mnt/share --ruleset "DoD / GovCon" --workers 8 \
+        --jsonl results.jsonl --vault --tenant-id 3 --checkpoint share.ckpt
+
+With --checkpoint, every finished file is appended to the checkpoint as
+resolved path / size / mtime / sha256. A re-run skips files whose size and
+mtime are unchanged, and files whose content hash is unchanged, so an
+interrupted scan resumes where it stopped. Files that failed are recorded
+with their error and skipped too, unless --retry-errors is given; so are
+files analyzed with extraction warnings (e.g. failed OCR). JSONL
+output is appended for the same reason.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from analysis_engine import HIGH_RISK_SCORE, analyze_many
+from extractors import SUPPORTED_EXTENSIONS
+from rulesets import RULESETS
+from utils import sha256_bytes
+
+
+def iter_documents(roots, extensions=SUPPORTED_EXTENSIONS):
+    """Yield (path, os.stat_result) for supported files under roots, in a stable order."""
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            if root.name.lower().endswith(extensions):
+                yield root, root.stat()
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not name.lower().endswith(extensions):
+                    continue
+                path = Path(dirpath) / name
+                try:
+                    yield path, path.stat()
+                except OSError:
+                    continue
+
+
+class Checkpoint:
+    """Append-only record of finished files: one JSON object per line."""
+
+    def __init__(self, path, retry_errors=False):
+        self.path = Path(path) if path else None
+        self.retry_errors = retry_errors
+        self.done = {}
+        if self.path and self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.done[rec["path"]] = rec
+        self._out = open(self.path, "a", encoding="utf-8") if self.path else None
+
+    @staticmethod
+    def key(path):
+        # the same file reached through a different relative path or cwd
+        return str(Path(path).resolve())
+
+    def is_done(self, path, st):
+        rec = self.done.get(self.key(path))
+        if rec is None or (self.retry_errors and rec.get("error")):
+            return False
+        if rec["size"] == st.st_size and rec["mtime"] == st.st_mtime:
+            return True
+        # touched or copied but possibly unchanged: fall back to the content hash
+        try:
+            return rec["size"] == st.st_size and sha256_bytes(Path(path).read_bytes()) == rec["sha256"]
+        except OSError:
+            return False
+
+    def record(self, path, st, sha256, error=None):
+        rec = {"path": self.key(path), "size": st.st_size, "mtime": st.st_mtime, "sha256": sha256}
+        if error:
+            rec["error"] = error
+        self.done[rec["path"]] = rec
+        if self._out:
+            self._out.write(json.dumps(rec) + "\n")
+            self._out.flush()
+
+    def close(self):
+        if self._out:
+            self._out.close()
+
+
+def scan(roots, ruleset_name, workers=None, jsonl=None, vault=False, checkpoint=None,
+         score_only=False, triage=False, cache=False, tenant_id=None, retry_errors=False,
+         log=sys.stderr):
+    """Analyze every supported file under roots; returns a summary dict."""
+    ckpt = Checkpoint(checkpoint, retry_errors)
+    stats = {}        # resolved path -> stat at the time it was queued
+    summary = {"analyzed": 0, "skipped": 0, "errors": 0, "warnings": 0, "LOW": 0, "MEDIUM": 0, "HIGH": 0}
+
+    if vault:
+        from db import init_db
+        from artifacts import build_artifacts
+        from evidence_vault import save_inspection
+        init_db()
+
+    def pending():
+        queued = set()    # overlapping or repeated roots reach the same file twice
+        for path, st in iter_documents(roots):
+            key = Checkpoint.key(path)
+            if key in queued:
+                continue
+            queued.add(key)
+            if ckpt.is_done(path, st):
+                summary["skipped"] += 1
+                continue
+            stats[key] = st
+            yield key
+
+    out = open(jsonl, "a", encoding="utf-8") if jsonl else None
+    try:
+        results = analyze_many(pending(), ruleset_name, workers=workers, cache=cache,
+                               score_only=score_only,
+                               stop_at_score=HIGH_RISK_SCORE if triage else None)
+        for meta, analysis in results:
+            path = meta["path"]
+            error = meta.get("error")
+            if analysis is None:
+                summary["errors"] += 1
+                print(f"error: {path}: {meta.get('error')}", file=log)
+            else:
+                summary["analyzed"] += 1
+                summary[analysis["risk_level"]] += 1
+                warnings = analysis.get("extraction_warnings")
+                if warnings:
+                    # analyzed on incomplete text: recorded like a failure, so --retry-errors redoes it
+                    summary["warnings"] += 1
+                    error = "; ".join(warnings)
+                    print(f"warning: {path}: {error}", file=log)
+                if vault:
+                    save_inspection(meta, analysis, build_artifacts(meta, analysis), tenant_id)
+            if out:
+                out.write(json.dumps({"meta": meta, "analysis": analysis}) + "\n")
+                out.flush()
+            ckpt.record(path, stats.pop(path), meta.get("sha256"), error)
+    finally:
+        if out:
+            out.close()
+        ckpt.close()
+    return summary
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk CUI scan of files and directories.")
+    ap.add_argument("roots", nargs="+", help="files or directories to scan")
+    ap.add_argument("--ruleset", default="DoD / GovCon", choices=list(RULESETS))
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    ap.add_argument("--jsonl", help="append one JSON result per file to this path")
+    ap.add_argument("--vault", action="store_true", help="store inspections in the evidence vault")
+    ap.add_argument("--checkpoint", help="checkpoint file for resumable scans")
+    ap.add_argument("--retry-errors", action="store_true",
+                    help="re-analyze files the checkpoint records as failed")
+    ap.add_argument("--score-only", action="store_true", help="counts and score only, no excerpts")
+    ap.add_argument("--triage", action="store_true", help=f"stop each file once its score reaches {HIGH_RISK_SCORE}")
+    ap.add_argument("--cache", action="store_true", help="reuse cached analyses of identical files")
+    ap.add_argument("--tenant-id", type=int, default=None,
+                    help="tenant that owns the stored inspections (required with --vault)")
+    args = ap.parse_args(argv)
+
+    if not args.jsonl and not args.vault:
+        ap.error("nothing to write: pass --jsonl and/or --vault")
+    if args.vault and args.tenant_id is None:
+        # pages only list the active tenant's inspections
+        ap.error("--vault requires --tenant-id")
+
+    summary = scan(args.roots, args.ruleset, workers=args.workers, jsonl=args.jsonl,
+                   vault=args.vault, checkpoint=args.checkpoint, score_only=args.score_only,
+                   triage=args.triage, cache=args.cache, tenant_id=args.tenant_id,
+                   retry_errors=args.retry_errors)
+    print(json.dumps(summary), file=sys.stderr)
+    sys.exit(1 if summary["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Background integrity scrubber for stored artifacts.
+
+    python scrubber.py                  # scrub continuously, SCRUB_INTERVAL_SECONDS between passes
+    python scrubber.py --once           # one pass, then publish tenant roots
+    python scrubber.py --root 3         # print tenant 3's current Merkle root
+    python scrubber.py --root null      # ... of inspections stored without a tenant
+
+Each pass re-hashes artifacts that were never verified or were last
+verified more than SCRUB_REVERIFY_DAYS ago, oldest first, in batches of
+SCRUB_BATCH_SIZE with a pause between batches and an overall read rate
+cap. The result ("ok", "mismatch", "missing") and time are recorded on
+the artifacts row. A blob shared by several artifacts is hashed once per
+batch.
+
+After a pass, a Merkle root over every tenant's artifact hashes is stored
+in merkle_roots. The tree follows RFC 6962: leaves are ordered by artifact
+id, leaf = SHA256(0x00 || "<artifact id> <inspection id> <name> <sha256>"),
+node = SHA256(0x01 || left || right). Anyone holding a tenant's manifest
+export can rebuild the same root and compare one hash.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from blob_store import iter_artifact
+from db import connection, init_db, retry_on_busy
+from utils import now_iso
+
+try:
+    from config import (
+        SCRUB_BATCH_SIZE, SCRUB_PAUSE_SECONDS, SCRUB_MAX_BYTES_PER_SECOND,
+        SCRUB_REVERIFY_DAYS, SCRUB_INTERVAL_SECONDS,
+    )
+except Exception:
+    SCRUB_BATCH_SIZE = 200
+    SCRUB_PAUSE_SECONDS = 0.5
+    SCRUB_MAX_BYTES_PER_SECOND = 50 * 1024 * 1024
+    SCRUB_REVERIFY_DAYS = 7
+    SCRUB_INTERVAL_SECONDS = 3600
+
+
+def _hash_artifact(row):
+    """(hex digest, bytes hashed) of an artifact's uncompressed content.
+
+    Raises OSError if the blob file is missing.
+    """
+    h = hashlib.sha256()
+    n = 0
+    for block in iter_artifact(row):
+        h.update(block)
+        n += len(block)
+    return h.hexdigest(), n
+
+
+@retry_on_busy
+def _record(results):
+    with connection() as con:
+        con.executemany("""
+            UPDATE artifacts SET last_verified_at=?, last_verified_status=? WHERE id=?
+        """, results)
+        con.commit()
+
+
+def scrub_batch(cutoff, batch_size=SCRUB_BATCH_SIZE):
+    """Verify up to batch_size artifacts last verified before cutoff (or never).
+
+    Returns (counts by status, bytes read).
+    """
+    with connection() as con:
+        rows = con.execute("""
+            SELECT id, sha256, storage, codec, content FROM artifacts
+            WHERE last_verified_at IS NULL OR last_verified_at < ?
+            ORDER BY last_verified_at, id
+            LIMIT ?
+        """, (cutoff, batch_size)).fetchall()
+
+    counts = {}
+    results = []
+    blobs = {}      # sha256 -> status, for blobs shared within the batch
+    read = 0
+    ts = now_iso()
+    for r in rows:
+        status = blobs.get(r["sha256"]) if r["storage"] == "blob" else None
+        if status is None:
+            try:
+                digest, n = _hash_artifact(r)
+                read += n
+                status = "ok" if digest == r["sha256"] else "mismatch"
+            except OSError:
+                status = "missing"
+            except (zlib.error, ValueError):
+                status = "mismatch"   # stored bytes no longer decode
+            if r["storage"] == "blob":
+                blobs[r["sha256"]] = status
+        counts[status] = counts.get(status, 0) + 1
+        results.append((ts, status, r["id"]))
+    if results:
+        _record(results)
+    return counts, read
+
+
+def scrub_pass(reverify_days=SCRUB_REVERIFY_DAYS, batch_size=SCRUB_BATCH_SIZE,
+               pause=SCRUB_PAUSE_SECONDS, max_bytes_per_second=SCRUB_MAX_BYTES_PER_SECOND, log=sys.stderr):
+    """Verify every artifact that is due; returns total counts by status."""
+    # never later than the start of the pass, or rows verified in it would qualify again;
+    # same text format as utils.now_iso, since last_verified_at is compared as a string
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=max(0, reverify_days))).strftime("%Y-%m-%dT%H:%M:%SZ")
+    totals = {}
+    started = time.time()
+    read = 0
+    while True:
+        counts, n = scrub_batch(cutoff, batch_size)
+        if not counts:
+            break
+        read += n
+        for status, c in counts.items():
+            totals[status] = totals.get(status, 0) + c
+        if counts.get("mismatch") or counts.get("missing"):
+            print(f"scrub: {counts}", file=log)
+        # stay under the read-rate cap, and always yield between batches
+        behind = read / max_bytes_per_second - (time.time() - started) if max_bytes_per_second else 0
+        time.sleep(max(pause, behind))
+    return totals
+
+
+# -----------------------------
+# Merkle roots
+# -----------------------------
+
+def _leaf(row):
+    data = f"{row['id']} {row['inspection_id']} {row['name']} {row['sha256']}".encode("utf-8")
+    return hashlib.sha256(b"\x00" + data).digest()
+
+
+def _node(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def merkle_root(con, tenant_id):
+    """(hex root, leaf count) over the tenant's artifacts, in artifact id order.
+
+    Built incrementally: memory is O(log n) in the number of artifacts.
+    """
+    stack = []      # [(subtree size, hash)], sizes strictly decreasing
+    count = 0
+    for row in con.execute("""
+        SELECT a.id, a.inspection_id, a.name, a.sha256
+        FROM artifacts a JOIN inspections i ON i.id = a.inspection_id
+        WHERE i.tenant_id IS ?
+        ORDER BY a.id
+    """, (tenant_id,)):
+        size, h = 1, _leaf(row)
+        while stack and stack[-1][0] == size:
+            left = stack.pop()[1]
+            size, h = size * 2, _node(left, h)
+        stack.append((size, h))
+        count += 1
+    if not stack:
+        return hashlib.sha256(b"").hexdigest(), 0
+    h = stack.pop()[1]
+    while stack:
+        h = _node(stack.pop()[1], h)
+    return h.hex(), count
+
+
+def _tenant_status(con, tenant_id):
+    counts = {}
+    for r in con.execute("""
+        SELECT COALESCE(a.last_verified_status, 'unverified') AS status, COUNT(*) AS n
+        FROM artifacts a JOIN inspections i ON i.id = a.inspection_id
+        WHERE i.tenant_id IS ?
+        GROUP BY 1
+    """, (tenant_id,)):
+        counts[r["status"]] = r["n"]
+    return counts
+
+
+@retry_on_busy
+def publish_roots():
+    """Compute and store the current Merkle root of every tenant; returns them."""
+    with connection() as con:
+        tenants = [r[0] for r in con.execute("SELECT DISTINCT tenant_id FROM inspections")]
+        out = []
+        for tenant_id in tenants:
+            root, count = merkle_root(con, tenant_id)
+            out.append((tenant_id, root, count, json.dumps(_tenant_status(con, tenant_id)), now_iso()))
+        con.executemany("""
+            INSERT INTO merkle_roots (tenant_id, root, artifact_count, status_json, computed_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, out)
+        con.commit()
+    return out
+
+
+def latest_root(con, tenant_id):
+    return con.execute("""
+        SELECT root, artifact_count, status_json, computed_at FROM merkle_roots
+        WHERE tenant_id IS ? ORDER BY computed_at DESC, id DESC LIMIT 1
+    """, (tenant_id,)).fetchone()
+
+
+def scrub(interval=SCRUB_INTERVAL_SECONDS, once=False, **kwargs):
+    init_db()
+    while True:
+        started = time.time()
+        totals = scrub_pass(**kwargs)
+        roots = publish_roots()
+        print(json.dumps({"finished_at": now_iso(), "seconds": round(time.time() - started, 1),
+                          "verified": totals, "tenants": len(roots)}), file=sys.stderr)
+        if once:
+            return totals
+        time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+def _tenant_arg(value):
+    """--root value: a tenant id, or "null" for inspections stored without a tenant."""
+    if value.lower() in ("null", "none"):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a tenant id: {value!r}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Verify stored artifacts and publish tenant Merkle roots.")
+    ap.add_argument("--once", action="store_true", help="run a single pass and exit")
+    ap.add_argument("--interval", type=float, default=SCRUB_INTERVAL_SECONDS, help="seconds between passes")
+    ap.add_argument("--batch-size", type=int, default=SCRUB_BATCH_SIZE)
+    ap.add_argument("--pause", type=float, default=SCRUB_PAUSE_SECONDS, help="seconds to sleep between batches")
+    ap.add_argument("--reverify-days", type=float, default=SCRUB_REVERIFY_DAYS,
+                    help="re-hash artifacts last verified longer ago than this")
+    ap.add_argument("--root", type=_tenant_arg, default=argparse.SUPPRESS, metavar="TENANT_ID",
+                    help='print the tenant\'s current Merkle root ("null": rows without a tenant) and exit')
+    args = ap.parse_args(argv)
+
+    if "root" in args:
+        init_db()
+        with connection() as con:
+            root, count = merkle_root(con, args.root)
+        print(json.dumps({"tenant_id": args.root, "root": root, "artifact_count": count}))
+        return
+    scrub(args.interval, args.once, reverify_days=args.reverify_days,
+          batch_size=args.batch_size, pause=args.pause)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import json
+import zlib
 import streamlit as st
+from blob_store import artifact_bytes
 from db import get_connection
 
 def render_search_page():
@@ -20,14 +22,16 @@ def render_search_page():
         min_score = st.slider("Min score", 0, 100, 0, key="s_min")
         max_score = st.slider("Max score", 0, 100, 100, key="s_max")
 
-    where, params = [], []
+    where, params = ["tenant_id IS ?"], [st.session_state.get("active_tenant")]
 
     if filename_q:
         where.append("filename LIKE ?")
         params.append(f"%{filename_q}%")
     if sha_q:
-        where.append("sha256 LIKE ?")
-        params.append(f"{sha_q}%")
+        # GLOB (unlike LIKE) is case-sensitive, so the prefix can use the sha256 index
+        prefix = "".join(c for c in sha_q.strip().lower() if c in "0123456789abcdef")
+        where.append("sha256 GLOB ?")
+        params.append(f"{prefix}*")
     if ruleset != "(any)":
         where.append("ruleset=?")
         params.append(ruleset)
@@ -53,13 +57,21 @@ def render_search_page():
     for r in rows:
         with st.expander(f"#{r['id']} • {r['filename']} • {r['risk_level']} ({r['risk_score']})"):
             art_rows = con.execute("""
-                SELECT name, sha256, content FROM artifacts WHERE inspection_id=?
+                SELECT name, sha256, storage, codec, content FROM artifacts WHERE inspection_id=?
             """, (r["id"],)).fetchall()
 
             for a in art_rows:
+                try:
+                    content = artifact_bytes(a)
+                except OSError:
+                    st.error(f"{a['name']}: stored content is missing")
+                    continue
+                except (zlib.error, ValueError):
+                    st.error(f"{a['name']}: stored content is corrupted")
+                    continue
                 st.download_button(
                     f"⬇ {a['name']}",
-                    data=a["content"],
+                    data=content,
                     file_name=a["name"],
                     key=f"s_dl_{r['id']}_{a['name']}"
                 )
@@ -0,0 +1,316 @@
+"""Local HTTP analysis service for machine-to-machine scanning.
+
+    python service.py --port 8765 --workers 4
+
+Endpoints (JSON responses; results are exactly what analyze_text returns):
+
+    POST /analyze            {"text": "...", "ruleset": "Basic", "score_only": false}
+    POST /analyze-file       raw document bytes; ?filename=report.pdf&ruleset=Basic
+    GET  /health             queue depth, in-flight batches, workers
+
+Concurrent requests are grouped into micro-batches (up to
+SERVICE_BATCH_SIZE requests or SERVICE_BATCH_MAX_BYTES, waiting at most
+SERVICE_BATCH_WAIT_MS for a batch to fill) and each batch runs as one task
+on a process pool. When SERVICE_MAX_QUEUE requests are waiting the service
+answers 503 with Retry-After; a tenant (X-Tenant-ID header) with
+SERVICE_TENANT_CONCURRENCY requests already open gets 429.
+
+Binds to 127.0.0.1 by default: the service has no authentication of its own
+and trusts X-Tenant-ID, so expose it only behind the calling tools.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from analysis_engine import analyze_stream, analyze_text
+from rulesets import RULESETS
+
+try:
+    from config import (
+        SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_MAX_QUEUE, SERVICE_BATCH_SIZE,
+        SERVICE_BATCH_WAIT_MS, SERVICE_BATCH_MAX_BYTES, SERVICE_TENANT_CONCURRENCY,
+        SERVICE_MAX_BODY_BYTES,
+    )
+except Exception:
+    SERVICE_HOST = "127.0.0.1"
+    SERVICE_PORT = 8765
+    SERVICE_WORKERS = 0
+    SERVICE_MAX_QUEUE = 256
+    SERVICE_BATCH_SIZE = 16
+    SERVICE_BATCH_WAIT_MS = 5
+    SERVICE_BATCH_MAX_BYTES = 4 * 1024 * 1024
+    SERVICE_TENANT_CONCURRENCY = 8
+    SERVICE_MAX_BODY_BYTES = 64 * 1024 * 1024
+
+DEFAULT_RULESET = "DoD / GovCon"
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 422: "Unprocessable Entity", 429: "Too Many Requests",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+
+def _run_job(job):
+    kind, ruleset_name, payload, filename, score_only = job
+    if kind == "text":
+        return analyze_text(payload, ruleset_name, score_only=score_only)
+    from extractors import iter_text_from_file, load_document
+    warnings = []
+    # already in a pool worker: OCR in this process rather than a nested pool
+    chunks = iter_text_from_file(load_document((filename, payload)), warnings, ocr_workers=1)
+    return analyze_stream(chunks, ruleset_name, score_only=score_only, extraction_warnings=warnings)
+
+
+def _run_batch(jobs):
+    """Runs in a pool process; one failing job does not fail the batch."""
+    out = []
+    for job in jobs:
+        try:
+            out.append((200, _run_job(job)))
+        except Exception as e:
+            out.append((422, {"error": f"{type(e).__name__}: {e}"}))
+    return out
+
+
+# -----------------------------
+# Service
+# -----------------------------
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class AnalysisService:
+    def __init__(self, workers=SERVICE_WORKERS, max_queue=SERVICE_MAX_QUEUE,
+                 batch_size=SERVICE_BATCH_SIZE, batch_wait_ms=SERVICE_BATCH_WAIT_MS,
+                 batch_max_bytes=SERVICE_BATCH_MAX_BYTES, tenant_concurrency=SERVICE_TENANT_CONCURRENCY):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.batch_max_bytes = batch_max_bytes
+        self.tenant_concurrency = tenant_concurrency
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.pool = None
+        self.inflight = 0
+        self.tenants = {}          # tenant id -> open request count
+        self.started = time.time()
+        self.completed = 0
+        self._slots = None         # batches allowed on the pool at once
+        self._batcher = None
+
+    async def start(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = asyncio.Semaphore(2 * self.workers)
+        self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def stop(self):
+        if self._batcher:
+            self._batcher.cancel()
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, job, size):
+        """Queue one job and wait for its (status, body)."""
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job, size, fut))
+        except asyncio.QueueFull:
+            raise HTTPError(503, "analysis queue is full; retry later", {"Retry-After": "1"})
+        return await fut
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = batch[0][1]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size and size < self.batch_max_bytes:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += item[1]
+            await self._slots.acquire()
+            self.inflight += 1
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.pool, _run_batch, [job for job, _, _ in batch])
+        except Exception as e:
+            results = [(500, {"error": f"{type(e).__name__}: {e}"})] * len(batch)
+        finally:
+            self.inflight -= 1
+            self._slots.release()
+        for (_, _, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+        self.completed += len(batch)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "queued": self.queue.qsize(),
+            "inflight_batches": self.inflight,
+            "workers": self.workers,
+            "completed": self.completed,
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    # ---- HTTP ----
+
+    async def handle(self, method, target, headers, body):
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "use GET")
+            return 200, self.health()
+
+        if url.path not in ("/analyze", "/analyze-file"):
+            raise HTTPError(404, "unknown endpoint")
+        if method != "POST":
+            raise HTTPError(405, "use POST")
+
+        if url.path == "/analyze":
+            try:
+                req = json.loads(body or b"{}")
+                text = req["text"]
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(400, 'expected a JSON object with a "text" field')
+            if not isinstance(text, str):
+                raise HTTPError(400, '"text" must be a string')
+            ruleset_name = req.get("ruleset", DEFAULT_RULESET)
+            if not isinstance(ruleset_name, str):
+                raise HTTPError(400, '"ruleset" must be a string')
+            job = ("text", ruleset_name, text, None, bool(req.get("score_only")))
+        else:
+            if not query.get("filename"):
+                raise HTTPError(400, "filename query parameter is required")
+            ruleset_name = query.get("ruleset", DEFAULT_RULESET)
+            score_only = query.get("score_only", "").lower() in ("1", "true", "yes")
+            job = ("file", ruleset_name, body, query["filename"], score_only)
+
+        if ruleset_name not in RULESETS:
+            raise HTTPError(400, f"unknown ruleset: {ruleset_name}")
+
+        tenant = headers.get("x-tenant-id", "default")
+        if self.tenants.get(tenant, 0) >= self.tenant_concurrency:
+            raise HTTPError(429, f"tenant {tenant} has too many requests in flight", {"Retry-After": "1"})
+        self.tenants[tenant] = self.tenants.get(tenant, 0) + 1
+        try:
+            return await self.submit(job, len(body))
+        finally:
+            self.tenants[tenant] -= 1
+            if not self.tenants[tenant]:
+                del self.tenants[tenant]
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    await _respond(writer, e.status, {"error": str(e)}, e.headers, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    status, payload = await self.handle(method, target, headers, body)
+                    extra = {}
+                except HTTPError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, e.headers
+                await _respond(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = h.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length")
+    if length > SERVICE_MAX_BODY_BYTES:
+        raise HTTPError(413, f"body larger than {SERVICE_MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+async def _respond(writer, status, payload, extra_headers=None, keep_alive=True):
+    body = json.dumps(payload).encode("utf-8")
+    head = [
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head += [f"{k}: {v}" for k, v in (extra_headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(host=SERVICE_HOST, port=SERVICE_PORT, **kwargs):
+    service = AnalysisService(**kwargs)
+    await service.start()
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local HTTP CUI analysis service.")
+    ap.add_argument("--host", default=SERVICE_HOST)
+    ap.add_argument("--port", type=int, default=SERVICE_PORT)
+    ap.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="pool processes (0 = one per CPU)")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
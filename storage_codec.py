@@ -0,0 +1,88 @@
+"""Compression codecs for stored inspection JSON and artifact bytes.
+
+Every stored value carries its codec name in a column next to it
+(inspections.analysis_codec, artifacts.codec, blobs.codec), so rows
+written with different settings, including rows written before
+compression existed ("identity"), read back the same way.
+
+Evidence hashes (inspections.sha256, artifacts.sha256) are always over
+the uncompressed bytes; compression is purely a storage detail.
+"""
+import json
+import zlib
+
+try:
+    from config import STORAGE_CODEC, STORAGE_COMPRESSION_LEVEL
+except Exception:
+    STORAGE_CODEC = "zlib"          # "identity" to store uncompressed
+    STORAGE_COMPRESSION_LEVEL = 6
+
+IDENTITY = "identity"
+CODECS = (IDENTITY, "zlib")
+
+_MIN_COMPRESS_BYTES = 256
+
+
+def encode(data, codec=None):
+    """(stored bytes, codec actually used) for raw bytes.
+
+    Small values, and values that do not shrink, are stored as identity.
+    """
+    codec = codec or STORAGE_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"unknown storage codec: {codec}")
+    if codec == IDENTITY or len(data) < _MIN_COMPRESS_BYTES:
+        return data, IDENTITY
+    packed = zlib.compress(data, STORAGE_COMPRESSION_LEVEL)
+    if len(packed) >= len(data):
+        return data, IDENTITY
+    return packed, codec
+
+
+def encode_as(data, codec):
+    """Stored bytes in exactly this codec (re-creating a value whose codec is already recorded)."""
+    if codec in (None, IDENTITY):
+        return data
+    if codec == "zlib":
+        return zlib.compress(data, STORAGE_COMPRESSION_LEVEL)
+    raise ValueError(f"unknown storage codec: {codec}")
+
+
+def decode(data, codec):
+    if data is None:
+        return b""
+    if codec in (None, IDENTITY):
+        return data.encode("utf-8") if isinstance(data, str) else bytes(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"unknown storage codec: {codec}")
+
+
+def iter_decode(chunks, codec):
+    """Decode a stream of stored chunks without holding the whole value."""
+    if codec in (None, IDENTITY):
+        yield from chunks
+        return
+    if codec != "zlib":
+        raise ValueError(f"unknown storage codec: {codec}")
+    d = zlib.decompressobj()
+    for chunk in chunks:
+        out = d.decompress(chunk)
+        if out:
+            yield out
+    out = d.flush()
+    if out:
+        yield out
+
+
+def dump_json(obj, codec=None):
+    """(column value, codec) for a JSON document; identity stays TEXT as before."""
+    text = json.dumps(obj)
+    data, used = encode(text.encode("utf-8"), codec)
+    return (text if used == IDENTITY else data), used
+
+
+def load_json(value, codec):
+    if codec in (None, IDENTITY):
+        return json.loads(value)
+    return json.loads(decode(value, codec))
@@ -1,15 +1,15 @@
 import streamlit as st
-from db import get_db
+from db import connection
 from permissions import can_view_all_tenants
 
 def ensure_active_tenant():
     user = st.session_state.user
 
     if can_view_all_tenants(user["role"]):
-        con = get_db()
-        tenants = con.execute(
-            "SELECT id, name FROM tenants WHERE is_active=1 ORDER BY name"
-        ).fetchall()
+        with connection() as con:
+            tenants = con.execute(
+                "SELECT id, name FROM tenants WHERE is_active=1 ORDER BY name"
+            ).fetchall()
 
         if not tenants:
             st.error("No active tenants exist")
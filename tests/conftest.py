@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """init_db() on an empty database under tmp_path; yields a connection."""
+    import db
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "cui_inspector.db")
+    db.init_db()
+    con = db.get_db()
+    yield con
+    con.close()
@@ -0,0 +1,31 @@
+import sqlite3
+
+import db
+from migrations import MIGRATIONS, check_query_plans, current_version
+
+
+def test_fresh_database_is_fully_migrated(fresh_db):
+    assert current_version(fresh_db) == MIGRATIONS[-1][0]
+
+
+def test_hot_queries_use_indexes(fresh_db):
+    assert check_query_plans(fresh_db) == []
+
+
+def test_legacy_inspections_go_to_the_only_tenant(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    con = sqlite3.connect(path)
+    con.executescript("""
+        CREATE TABLE tenants (id INTEGER PRIMARY KEY, name TEXT);
+        INSERT INTO tenants (id, name) VALUES (7, 'Acme');
+        CREATE TABLE inspections (id INTEGER PRIMARY KEY AUTOINCREMENT, filename TEXT, sha256 TEXT,
+            ruleset TEXT, risk_level TEXT, risk_score INTEGER, analysis_json TEXT, created_at TEXT);
+        INSERT INTO inspections (filename) VALUES ('old.pdf');
+    """)
+    con.commit()
+    con.close()
+
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+    with db.connection() as con:
+        assert con.execute("SELECT tenant_id FROM inspections").fetchone()[0] == 7
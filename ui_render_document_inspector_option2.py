@@ -1,13 +1,42 @@
 # Replace render_document_inspector() in ui.py with this function.
 # Keep the rest of ui.py intact (nav, Evidence Vault, Search, Compare, Manifest Export, etc.)
 
+import zipfile
+
 import streamlit as st
-from extractors import extract_text_from_file
-from utils import now_iso, sha256_bytes
+from extractors import ExtractionError, iter_text_from_file
+from utils import file_meta, sha256_bytes
 from rulesets import RULESETS, ruleset_names
-from analysis_engine import analyze_text
+from analysis_engine import HIGH_RISK_SCORE, analyze_stream, analyze_stream_all
+from analysis_cache import cached_analysis, get_cached_analysis, put_cached_analysis
 from artifacts import build_artifacts, artifacts_to_download_buttons
 from evidence_vault import save_inspection
+from metrics import REGISTRY
+from archives import analyze_archive, is_archive, save_archive_inspection
+from matcher import get_compiled
+
+PREVIEW_CHARS = 8000
+
+
+def _preview_text(chunks, limit=PREVIEW_CHARS):
+    # Only the first `limit` characters are ever held; analysis re-streams the upload.
+    out, n = [], 0
+    for chunk in chunks:
+        out.append(chunk)
+        n += len(chunk)
+        if n >= limit:
+            break
+    return "".join(out)[:limit]
+
+
+def _archive_listing(uploaded, limit=PREVIEW_CHARS):
+    # Member names only; members are expanded when the analysis runs.
+    try:
+        with zipfile.ZipFile(uploaded) as zf:
+            names = [i.filename for i in zf.infolist() if not i.is_dir()]
+    except zipfile.BadZipFile as e:
+        raise ExtractionError(f"{uploaded.name}: {e}") from e
+    return ("Archive members:\n" + "\n".join(names))[:limit]
 
 
 def render_document_inspector():
@@ -16,43 +45,117 @@ def render_document_inspector():
     with colA:
         uploaded = st.file_uploader(
             "Upload a document",
-            type=["pdf", "txt", "docx", "pptx"],
+            type=["pdf", "txt", "docx", "pptx", "zip"],
             key="doc_upload"
         )
 
         if uploaded:
-            text = extract_text_from_file(uploaded)
-            meta = {
-                "filename": uploaded.name,
-                "size_bytes": uploaded.size,
-                "sha256": sha256_bytes(uploaded.getvalue()),
-                "uploaded_at": now_iso(),
-            }
-
-            st.session_state.last_text = text
-            st.session_state.last_meta = meta
-            st.session_state.last_analysis = None
-            st.session_state.artifacts = None
+            sha = sha256_bytes(uploaded.getvalue())
+            last_meta = st.session_state.get("last_meta") or {}
+
+            # Streamlit reruns this on every interaction; only a new file is re-extracted.
+            if last_meta.get("sha256") != sha or last_meta.get("filename") != uploaded.name:
+                warnings = []
+                try:
+                    if is_archive(uploaded.name):
+                        st.session_state.last_text = _archive_listing(uploaded)
+                    else:
+                        st.session_state.last_text = _preview_text(iter_text_from_file(uploaded, warnings))
+                except ExtractionError as e:
+                    warnings.append(str(e))
+                    st.session_state.last_text = ""
+                st.session_state.extract_warnings = warnings
+                st.session_state.last_meta = file_meta(uploaded.name, uploaded.getvalue())
+                st.session_state.last_analysis = None
+                st.session_state.all_analyses = None
+                st.session_state.artifacts = None
+
+            text = st.session_state.last_text
+            meta = st.session_state.last_meta
+
+            for w in st.session_state.get("extract_warnings") or []:
+                st.error(w)
 
             st.subheader("File Metadata")
             st.json(meta)
 
             st.subheader("Extracted Text (preview)")
-            st.text_area("Preview", text[:8000], height=260, key="preview_text")
+            st.text_area("Preview", text, height=260, key="preview_text")
 
     with colB:
         st.subheader("Analysis Controls")
 
         rs_name = st.selectbox("Ruleset", ruleset_names(), key="ruleset_select")
         st.caption(RULESETS[rs_name]["description"])
+        for pname, pdef in RULESETS[rs_name]["patterns"].items():
+            for issue in get_compiled(rs_name).warnings.get(pdef["regex"], []):
+                st.warning(f"Pattern {pname}: {issue}")
+
+        score_all = st.checkbox("Also score under every other ruleset (single scan)", key="score_all_rulesets")
+        profile = st.checkbox("Profile rules (timings per pattern; bypasses cache)", key="profile_rules")
+        triage = st.checkbox(
+            f"Triage: stop as soon as the score reaches HIGH ({HIGH_RISK_SCORE}); partial scan, not cached",
+            key="triage_mode",
+        )
 
-        can_run = bool((st.session_state.last_text or "").strip())
+        can_run = uploaded is not None and bool((st.session_state.last_text or "").strip())
         if st.button("▶ Run Analysis", type="primary", disabled=not can_run, key="run_analysis"):
-            analysis = analyze_text(st.session_state.last_text, rs_name)
-            st.session_state.last_analysis = analysis
-            st.session_state.artifacts = build_artifacts(st.session_state.last_meta, analysis)
+            warnings = []     # extraction problems during the analysis pass (e.g. failed OCR)
+            try:
+                sha = st.session_state.last_meta["sha256"]
+                if is_archive(uploaded.name):
+                    with st.spinner("Expanding and analyzing archive members…"):
+                        meta, rollup, members, _ = analyze_archive(uploaded, rs_name, cache=True)
+                    arts = build_artifacts(meta, rollup)
+                    save_archive_inspection(meta, rollup, arts, members,
+                                            tenant_id=st.session_state.get("active_tenant"))
+                    st.session_state.last_analysis = rollup
+                    st.session_state.artifacts = arts
+                    results = {}
+                elif profile or triage:
+                    chunks = iter_text_from_file(uploaded, warnings)
+                    stop_at = HIGH_RISK_SCORE if triage else None
+                    verdict = st.empty()
+
+                    def show_progress(chars, score):
+                        verdict.caption(f"Scanned {chars:,} characters — running score {score}")
 
-            save_inspection(st.session_state.last_meta, analysis, st.session_state.artifacts)
+                    if score_all:
+                        results = analyze_stream_all(chunks, ruleset_names(), profile=profile,
+                                                     stop_at_score=stop_at, on_progress=show_progress,
+                                                     extraction_warnings=warnings)
+                    else:
+                        results = {rs_name: analyze_stream(chunks, rs_name, profile=profile,
+                                                           stop_at_score=stop_at, on_progress=show_progress,
+                                                           extraction_warnings=warnings)}
+                    verdict.empty()
+                elif score_all:
+                    results = {n: get_cached_analysis(sha, n) for n in ruleset_names()}
+                    missing = [n for n, a in results.items() if a is None]
+                    if missing:
+                        fresh = analyze_stream_all(iter_text_from_file(uploaded, warnings), missing,
+                                                   extraction_warnings=warnings)
+                        for n, a in fresh.items():
+                            put_cached_analysis(sha, n, a)
+                        results.update(fresh)
+                else:
+                    results = {rs_name: cached_analysis(
+                        sha, rs_name,
+                        lambda: analyze_stream(iter_text_from_file(uploaded, warnings), rs_name,
+                                               extraction_warnings=warnings),
+                    )}
+            except ExtractionError as e:
+                st.error(str(e))
+                results = {}
+
+            for n, a in results.items():
+                arts = build_artifacts(st.session_state.last_meta, a)
+                save_inspection(st.session_state.last_meta, a, arts,
+                                tenant_id=st.session_state.get("active_tenant"))
+                if n == rs_name:
+                    st.session_state.last_analysis = a
+                    st.session_state.artifacts = arts
+            st.session_state.all_analyses = results if score_all else None
 
         if st.session_state.last_analysis:
             a = st.session_state.last_analysis
@@ -64,6 +167,41 @@ def render_document_inspector():
             m1.metric("CUI Detected", "YES" if a.get("cui_detected") else "NO")
             m2.metric("Risk Level", a.get("risk_level", ""))
             m3.metric("Risk Score", a.get("risk_score", 0))
+            for w in a.get("extraction_warnings", []):
+                st.error(f"{w} — the text analyzed may be incomplete; this result is not cached")
+
+            all_analyses = st.session_state.get("all_analyses")
+            if all_analyses:
+                st.table([{
+                    "Ruleset": n,
+                    "CUI Detected": "YES" if r.get("cui_detected") else "NO",
+                    "Risk Level": r.get("risk_level", ""),
+                    "Risk Score": r.get("risk_score", 0),
+                } for n, r in all_analyses.items()])
+
+            if a.get("archive_members") is not None:
+                with st.expander(f"🗂 Archive Members ({len(a['archive_members'])})", expanded=True):
+                    st.table([{
+                        "Member": m["path"],
+                        "Risk Level": m["risk_level"] or "—",
+                        "Risk Score": m["risk_score"] if m["risk_score"] is not None else "—",
+                        "CUI Detected": "" if m["cui_detected"] is None else ("YES" if m["cui_detected"] else "NO"),
+                        "Error": m["error"] or "; ".join(m.get("extraction_warnings") or []),
+                    } for m in a["archive_members"]])
+                    for sk in a.get("archive_skipped", []):
+                        st.caption(f"Skipped {sk['path']}: {sk['reason']}")
+
+            if a.get("partial_scan"):
+                st.info(
+                    f"Triage verdict: scanning stopped after {a.get('chars_scanned', 0):,} characters "
+                    "once the score reached HIGH. Re-run without triage for full counts."
+                )
+
+            if a.get("truncated_patterns"):
+                st.warning(
+                    "Regex execution budget exceeded; counts are partial for: "
+                    + ", ".join(a["truncated_patterns"])
+                )
 
             with st.expander("🔍 Detection Signals", expanded=True):
                 for i, s in enumerate(a.get("signals", []), 1):
@@ -111,6 +249,22 @@ def render_document_inspector():
                         st.markdown("**FedRAMP Moderate**")
                         for row in cm.get("FedRAMP_Moderate", []):
                             st.write(f"- {row.get('control')}: {row.get('title')}")
+
+            prof = a.get("profile")
+            if prof:
+                with st.expander("⏱ Rule Profile"):
+                    st.caption(f"Total {prof['total_ms']} ms over {prof['chars_scanned']:,} characters")
+                    st.table([{"Phase": k, "ms": v} for k, v in prof["phases"].items()])
+                    st.table([{
+                        "Pattern": name,
+                        "ms": row["ms"],
+                        "Matches": row["matches"],
+                        "Chars scanned": row["chars_scanned"],
+                        "Regex": row["regex"],
+                    } for name, row in prof["patterns"].items()])
+                    st.markdown("**Recent timings in this process**")
+                    st.table([{"Metric": k, **v} for k, v in REGISTRY.snapshot().items()])
+
             st.divider()
             st.subheader("Artifacts")
             artifacts_to_download_buttons(st.session_state.artifacts)
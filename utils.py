@@ -1,9 +1,9 @@
-from datetime import datetime
+from datetime import datetime, timezone
 import hashlib
 
 
 def now_iso():
-    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
 def sha256_bytes(data: bytes):
@@ -15,3 +15,11 @@ def sha256_bytes(data: bytes):
 def clamp(n, lo, hi):
     return max(lo, min(hi, n))
 
+
+def file_meta(filename: str, data: bytes):
+    return {
+        "filename": filename,
+        "size_bytes": len(data),
+        "sha256": sha256_bytes(data),
+        "uploaded_at": now_iso(),
+    }
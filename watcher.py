@@ -0,0 +1,180 @@
+"""Watch-folder daemon: keep inspections current for slowly changing shares.
+
+    python watcher.py /mnt/share /mnt/contracts --tenant-id 3 --ruleset "DoD / GovCon" --interval 300
+
+Every pass walks the folders (same walker as scan_cli) and compares each
+file with file_index (path, size, mtime, sha256):
+
+- size and mtime unchanged: skipped without reading the file
+- size or mtime changed but same sha256: index updated, nothing analyzed
+- new or changed content (or an edited ruleset): analyzed on the worker
+  pool and stored as a new inspection
+- failed last time: analyzed again on every pass until it succeeds, so a
+  transient failure (file locked mid-copy, OCR error) is not permanent
+
+Index rows of files that disappeared are removed at the end of each pass.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from analysis_engine import ENGINE_ID, analyze_many
+from artifacts import build_artifacts
+from db import get_db, init_db
+from evidence_vault import save_inspection
+from matcher import ruleset_fingerprint
+from rulesets import RULESETS
+from scan_cli import iter_documents
+from utils import now_iso, sha256_bytes
+
+try:
+    from config import WATCH_FOLDERS, WATCH_INTERVAL_SECONDS
+except Exception:
+    WATCH_FOLDERS = []
+    WATCH_INTERVAL_SECONDS = 300
+
+_SEEN_BATCH = 5000
+
+
+def _index_row(con, path, ruleset_name):
+    return con.execute("""
+        SELECT size, mtime, sha256, ruleset_fingerprint, last_error FROM file_index WHERE path=? AND ruleset=?
+    """, (path, ruleset_name)).fetchone()
+
+
+def _upsert(con, path, ruleset_name, fingerprint, st, sha, inspection_id=None, error=None):
+    ts = now_iso()
+    con.execute("""
+        INSERT INTO file_index
+        (path, ruleset, ruleset_fingerprint, size, mtime, sha256,
+         last_inspection_id, last_error, last_scanned_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (path, ruleset) DO UPDATE SET
+            ruleset_fingerprint=excluded.ruleset_fingerprint,
+            size=excluded.size,
+            mtime=excluded.mtime,
+            sha256=excluded.sha256,
+            last_inspection_id=COALESCE(excluded.last_inspection_id, file_index.last_inspection_id),
+            last_error=excluded.last_error,
+            last_scanned_at=excluded.last_scanned_at
+    """, (path, ruleset_name, fingerprint, st.st_size, st.st_mtime, sha, inspection_id, error, ts))
+
+
+def _outermost(roots):
+    """roots without duplicates and without roots nested inside another one.
+
+    Overlapping roots would otherwise queue the same file twice in a pass.
+    """
+    paths = sorted({Path(r) for r in roots}, key=lambda p: len(p.parts))
+    out = []
+    for p in paths:
+        if not any(p == q or q in p.parents for q in out):
+            out.append(p)
+    return out
+
+
+def scan_pass(roots, ruleset_name, workers=None, tenant_id=None, log=sys.stderr):
+    """One incremental pass over roots; returns counts of what happened."""
+    fingerprint = f"{ruleset_fingerprint(RULESETS[ruleset_name])}:{ENGINE_ID}"
+    counts = {"unchanged": 0, "touched": 0, "analyzed": 0, "errors": 0, "warnings": 0, "removed": 0}
+    stats = {}
+
+    con = get_db()
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+    con.execute("DELETE FROM seen")
+    con.commit()
+    seen = []
+
+    def changed():
+        for path, st in iter_documents(_outermost(roots)):
+            path = str(path)
+            seen.append((path,))
+            if len(seen) >= _SEEN_BATCH:
+                con.executemany("INSERT OR IGNORE INTO seen VALUES (?)", seen)
+                con.commit()
+                seen.clear()
+
+            row = _index_row(con, path, ruleset_name)
+            if row and row["ruleset_fingerprint"] == fingerprint and not row["last_error"]:
+                if row["size"] == st.st_size and row["mtime"] == st.st_mtime:
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    sha = sha256_bytes(Path(path).read_bytes())
+                except OSError:
+                    continue
+                if sha == row["sha256"]:
+                    _upsert(con, path, ruleset_name, fingerprint, st, sha)
+                    # never hold a write lock while save_inspection writes on its own connection
+                    con.commit()
+                    counts["touched"] += 1
+                    continue
+            stats[path] = st
+            yield path
+
+    for meta, analysis in analyze_many(changed(), ruleset_name, workers=workers):
+        path = meta["path"]
+        st = stats.pop(path)
+        if analysis is None:
+            counts["errors"] += 1
+            print(f"error: {path}: {meta.get('error')}", file=log)
+            if "sha256" in meta:
+                _upsert(con, path, ruleset_name, fingerprint, st, meta["sha256"], error=meta["error"])
+        else:
+            counts["analyzed"] += 1
+            inspection_id = save_inspection(meta, analysis, build_artifacts(meta, analysis), tenant_id)
+            if analysis.get("extraction_warnings"):
+                # stored with the warnings in its analysis; reported, not retried every pass
+                counts["warnings"] += 1
+                print(f"warning: {path}: {'; '.join(analysis['extraction_warnings'])}", file=log)
+            _upsert(con, path, ruleset_name, fingerprint, st, meta["sha256"], inspection_id)
+        con.commit()
+
+    con.executemany("INSERT OR IGNORE INTO seen VALUES (?)", seen)
+    for root in roots:
+        # files under this root that were not seen in this pass are gone
+        prefix = str(Path(root))
+        cur = con.execute("""
+            DELETE FROM file_index
+            WHERE ruleset=? AND (path=? OR substr(path, 1, ?)=?)
+              AND path NOT IN (SELECT path FROM seen)
+        """, (ruleset_name, prefix, len(prefix) + 1, prefix + os.sep))
+        counts["removed"] += cur.rowcount
+    con.commit()
+    con.close()
+    return counts
+
+
+def watch(roots, ruleset_name, interval=WATCH_INTERVAL_SECONDS, workers=None, once=False, tenant_id=None):
+    init_db()
+    while True:
+        started = time.time()
+        counts = scan_pass(roots, ruleset_name, workers=workers, tenant_id=tenant_id)
+        print(json.dumps({"finished_at": now_iso(), "seconds": round(time.time() - started, 1), **counts}),
+              file=sys.stderr)
+        if once:
+            return counts
+        time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Incrementally scan watched folders into the evidence vault.")
+    ap.add_argument("roots", nargs="*", help="folders to watch (default: WATCH_FOLDERS in config.py)")
+    ap.add_argument("--ruleset", default="DoD / GovCon", choices=list(RULESETS))
+    ap.add_argument("--interval", type=float, default=WATCH_INTERVAL_SECONDS, help="seconds between passes")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    ap.add_argument("--once", action="store_true", help="run a single pass and exit")
+    ap.add_argument("--tenant-id", type=int, required=True, help="tenant that owns the stored inspections")
+    args = ap.parse_args(argv)
+
+    roots = args.roots or WATCH_FOLDERS
+    if not roots:
+        ap.error("no folders to watch: pass them or set WATCH_FOLDERS in config.py")
+    watch(roots, args.ruleset, args.interval, args.workers, args.once, args.tenant_id)
+
+
+if __name__ == "__main__":
+    main()